@@ -0,0 +1,46 @@
+import os
+import script
+import script_read_all_terminal
+import script_read_all_terminal_new_format_cert
+import read_ssl_script
+from logscan.cli import build_parser
+from logscan.extract import run_reports
+
+# Paths
+log_folder = "logs"  # Folder where the log files are located
+
+# Reports that can share one scan of the logs: name -> script defining it.
+# Each report file gets "_<name>" in front of its extension.
+reports = {
+    "terminal": script,
+    "all_terminal": script_read_all_terminal,
+    "cert": script_read_all_terminal_new_format_cert,
+    "ssl": read_ssl_script,
+}
+
+
+# Main code: every chosen report is built from the same single read of each log file
+def main():
+    parser = build_parser("Extract several reports (terminal, all_terminal, cert, ssl) in one pass over the logs")
+    parser.add_argument(
+        "--reports", metavar="LIST", default=",".join(reports),
+        help="Comma separated reports to build (default %(default)s)",
+    )
+    for module in reports.values():
+        if hasattr(module, "add_arguments"):
+            module.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.follow:
+        raise SystemExit("--follow follows one report; run its own script")
+    names = [name.strip() for name in args.reports.split(",") if name.strip()]
+    unknown = [name for name in names if name not in reports]
+    if unknown or not names:
+        raise SystemExit(f"--reports takes some of: {', '.join(reports)}")
+
+    chosen = [reports[name].Report(args, name_suffix=f"_{name}") for name in names]
+    run_reports(args, chosen, log_folder, os.path.basename(__file__))
+
+
+if __name__ == "__main__":
+    main()
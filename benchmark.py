@@ -0,0 +1,221 @@
+import argparse
+import importlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from functools import partial
+
+# Where the synthetic logs, the reports of the runs and the results go
+bench_folder = "bench"
+
+# Reports that can be benchmarked: name -> script (as in all_reports.py)
+scripts = {
+    "terminal": "script",
+    "all_terminal": "script_read_all_terminal",
+    "cert": "script_read_all_terminal_new_format_cert",
+    "ssl": "read_ssl_script",
+}
+
+# Terminal script.py extracts in a benchmark (one of the generated ones)
+bench_terminal = "20049907"
+
+
+# Synthetic logs of size_mb MB, generated once and reused by later runs. The
+# manifest holds how many files, lines and bytes they are.
+def ensure_logs(data_folder, size_mb, uuids, seed):
+    from logscan.synthetic import generate_logs
+
+    folder = os.path.join(data_folder, f"{size_mb}mb{'_uuid' if uuids else ''}_seed{seed}")
+    manifest_path = os.path.join(folder, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return folder, json.load(file)
+
+    log_folder = os.path.join(folder, "logs")
+    shutil.rmtree(folder, ignore_errors=True)
+    print(f"Generating {size_mb} MB of logs in {log_folder} ...")
+    started = time.perf_counter()
+    files, lines, size = generate_logs(log_folder, size_mb, uuids=uuids, seed=seed)
+    manifest = {"files": files, "lines": lines, "bytes": size, "uuids": uuids, "seed": seed,
+                "generate_seconds": round(time.perf_counter() - started, 3)}
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file)
+    return folder, manifest
+
+
+# Run one report over the logs in log_folder in this process and print its
+# timings as JSON: the scan (waiting for the scanned events of each file) and
+# building + writing the report rows are timed apart
+def run_one(name, engine, workers, output_format, log_folder):
+    from logscan.cli import build_parser, chunk_size
+    from logscan.extract import scan_range
+    from logscan.memory import peak_rss_mb
+    from logscan.parallel import map_file_ranges
+    from logscan.reader import list_log_files
+
+    module = importlib.import_module(scripts[name])
+    parser = build_parser(name)
+    if hasattr(module, "add_arguments"):
+        module.add_arguments(parser)
+    argv = ["--engine", engine, "--workers", str(workers), "--format", output_format]
+    if name == "terminal":
+        argv += ["--terminals", bench_terminal]
+    args = parser.parse_args(argv)
+
+    scan_seconds = write_seconds = 0.0
+    with redirect_stdout(io.StringIO()):  # The report's own "Data written to ..."
+        report = module.Report(args)
+        scan = partial(scan_range, engine=engine, extractors=[report.extractor])
+        results = map_file_ranges(scan, list_log_files(log_folder), workers, chunk_size(args))
+        while True:
+            started = time.perf_counter()
+            file_results = next(results, None)
+            scanned = time.perf_counter()
+            scan_seconds += scanned - started
+            if file_results is None:
+                break
+            file_path, range_results = file_results
+            report.add_file(file_path, [result[0] for result in range_results])
+            write_seconds += time.perf_counter() - scanned
+        started = time.perf_counter()
+        report.close()
+        write_seconds += time.perf_counter() - started
+
+    print(json.dumps({"scan_seconds": scan_seconds, "write_seconds": write_seconds, "peak_rss_mb": peak_rss_mb()}))
+
+
+# Version of the code being measured: the git commit, or "unknown"
+def code_version():
+    try:
+        result = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    return result.stdout.strip() or "unknown"
+
+
+# Measure one report in a fresh process (so its peak memory is its own) and
+# return the result record
+def measure(name, engine, workers, output_format, data_folder, manifest, version):
+    work_folder = os.path.join(data_folder, "work")
+    shutil.rmtree(work_folder, ignore_errors=True)
+    os.makedirs(work_folder)
+    command = [sys.executable, os.path.abspath(__file__), "--run-one", name, engine, str(workers), output_format,
+               os.path.abspath(os.path.join(data_folder, "logs"))]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(command, cwd=work_folder, env=env, capture_output=True, text=True)
+    shutil.rmtree(work_folder, ignore_errors=True)
+    if result.returncode != 0:
+        raise SystemExit(f"{name} --engine {engine} failed:\n{result.stderr}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+    scan_seconds = timings["scan_seconds"]
+    size_mb = manifest["bytes"] / (1024 * 1024)
+    return {
+        "time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "version": version,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "script": scripts[name] + ".py",
+        "report": name,
+        "engine": engine,
+        "workers": workers,
+        "format": output_format,
+        "size_mb": round(size_mb, 1),
+        "files": manifest["files"],
+        "lines": manifest["lines"],
+        "uuids": manifest["uuids"],
+        "scan_seconds": round(scan_seconds, 3),
+        "write_seconds": round(timings["write_seconds"], 3),
+        "lines_per_sec": round(manifest["lines"] / scan_seconds) if scan_seconds else None,
+        "mb_per_sec": round(size_mb / scan_seconds, 1) if scan_seconds else None,
+        "peak_rss_mb": round(timings["peak_rss_mb"], 1) if timings["peak_rss_mb"] is not None else None,
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run-one":
+        name, engine, workers, output_format, log_folder = sys.argv[2:7]
+        run_one(name, engine, int(workers), output_format, log_folder)
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark the log reading scripts on synthetic ProdAPP logs")
+    parser.add_argument(
+        "--size-mb", type=int, nargs="+", default=[10],
+        help="Sizes of the generated logs in MB, from 10 MB up to 10 GB (10240); each is measured (default 10)",
+    )
+    parser.add_argument(
+        "--reports", default=",".join(scripts),
+        help="Comma separated reports to measure: terminal (script.py), all_terminal, cert, ssl (default all)",
+    )
+    parser.add_argument(
+        "--engines", default="text,bytes",
+        help="Comma separated engines to measure (default text,bytes)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Worker processes per run (0 = one per CPU, default 1)",
+    )
+    parser.add_argument(
+        "--format", default="xlsx",
+        help="Report format written (default xlsx)",
+    )
+    parser.add_argument(
+        "--old-format", action="store_true",
+        help="Generate logs without transaction UUIDs (the cert report then finds nothing and is skipped)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=1,
+        help="Seed of the log generator; the same seed gives the same logs (default 1)",
+    )
+    parser.add_argument(
+        "--data", metavar="FOLDER", default=os.path.join(bench_folder, "data"),
+        help="Where generated logs are kept between runs (default bench/data)",
+    )
+    parser.add_argument(
+        "--results", metavar="FILE", default=os.path.join(bench_folder, "results.jsonl"),
+        help="JSON Lines file every measurement is appended to (default bench/results.jsonl)",
+    )
+    parser.add_argument(
+        "--generate-only", action="store_true",
+        help="Only generate the logs for --size-mb",
+    )
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.reports.split(",") if name.strip()]
+    unknown = [name for name in names if name not in scripts]
+    if unknown or not names:
+        raise SystemExit(f"--reports takes some of: {', '.join(scripts)}")
+    if args.old_format and "cert" in names:
+        names.remove("cert")
+    engines = [engine.strip() for engine in args.engines.split(",") if engine.strip()]
+
+    version = code_version()
+    results_folder = os.path.dirname(args.results)
+    if results_folder:
+        os.makedirs(results_folder, exist_ok=True)
+    print(f"{'report':<14}{'engine':<8}{'MB':>8}{'lines/s':>11}{'MB/s':>8}{'write s':>9}{'RSS MB':>9}")
+    for size_mb in args.size_mb:
+        data_folder, manifest = ensure_logs(args.data, size_mb, not args.old_format, args.seed)
+        if args.generate_only:
+            print(f"{data_folder}: {manifest['files']} files, {manifest['lines']} lines")
+            continue
+        for name in names:
+            for engine in engines:
+                record = measure(name, engine, args.workers, args.format, data_folder, manifest, version)
+                with open(args.results, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(record) + "\n")
+                print(f"{name:<14}{engine:<8}{record['size_mb']:>8}{record['lines_per_sec']:>11}{record['mb_per_sec']:>8}"
+                      f"{record['write_seconds']:>9}{record['peak_rss_mb']:>9}")
+    print(f"Results appended to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import glob
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+
+# Reports built from the lines of a log in order, checked with --sources:
+# name -> (script, column identifying a row)
+scripts = {
+    "terminal": ("script", "RRNumber"),
+    "all_terminal": ("script_read_all_terminal", "DeviceSerialNumber"),
+}
+
+# Columns that differ between a server's own report and the merged one
+skipped_columns = ("SrNo", "FilePath")
+
+
+# Rows of one report run over log_folder (or with --sources), by their key
+# column. script.py extracts every generated terminal, each to its own file.
+def run_report(name, log_folder, sources, output_path):
+    from logscan.cli import build_parser
+    from logscan.extract import run_reports
+    from logscan.synthetic import TERMINALS
+
+    script_name, key_column = scripts[name]
+    module = importlib.import_module(script_name)
+    parser = build_parser(name)
+    if hasattr(module, "add_arguments"):
+        module.add_arguments(parser)
+    argv = ["--format", "jsonl", "--output", output_path]
+    if sources:
+        argv += ["--sources", *sources]
+    if name == "terminal":
+        argv += ["--terminals", ",".join(TERMINALS)]
+    args = parser.parse_args(argv)
+    with redirect_stdout(io.StringIO()):  # The report's own "Data written to ..."
+        run_reports(args, [module.Report(args)], log_folder, script_name + ".py")
+
+    rows = {}
+    root, extension = os.path.splitext(output_path)
+    for path in sorted(glob.glob(root + "*" + extension)):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                row = json.loads(line)
+                rows[row[key_column]] = {col: value for col, value in row.items() if col not in skipped_columns}
+    return rows
+
+
+# Compare the rows of every server's own report with those of one --sources
+# run over all of them: a row whose key only one server logged must come out
+# the same. Returns the (key, server) pairs that don't.
+def check_report(name, server_folders, work_folder):
+    server_rows = [run_report(name, folder, None, os.path.join(work_folder, f"{name}_{i}.jsonl"))
+                   for i, folder in enumerate(server_folders)]
+    merged_rows = run_report(name, None, server_folders, os.path.join(work_folder, f"{name}_merged.jsonl"))
+
+    mismatches = []
+    checked = 0
+    for i, rows in enumerate(server_rows):
+        others = [other for j, other in enumerate(server_rows) if j != i]
+        for key, row in rows.items():
+            if any(key in other for other in others):
+                continue  # Kept from whichever server logged it first
+            checked += 1
+            if merged_rows.get(key) != row:
+                mismatches.append((key, server_folders[i]))
+    print(f"{name:<14}{checked:>8} single-server rows{len(mismatches):>8} different with --sources")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that --sources gives every server's transactions the rows of the server's own report")
+    parser.add_argument(
+        "--servers", type=int, default=2,
+        help="Synthetic app servers generated, seeds 1, 2 ... (default 2)",
+    )
+    parser.add_argument(
+        "--size-mb", type=float, default=2,
+        help="Size of each server's logs in MB (default 2)",
+    )
+    parser.add_argument(
+        "--reports", default=",".join(scripts),
+        help="Comma separated reports to check: terminal (script.py), all_terminal (default both)",
+    )
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.reports.split(",") if name.strip()]
+    unknown = [name for name in names if name not in scripts]
+    if unknown or not names:
+        raise SystemExit(f"--reports takes some of: {', '.join(scripts)}")
+
+    from logscan.synthetic import generate_logs
+
+    work_folder = tempfile.mkdtemp(prefix="check_sources_")
+    current_folder = os.getcwd()
+    try:
+        os.chdir(work_folder)  # The scripts create their export folders where they run
+        server_folders = []
+        for seed in range(1, args.servers + 1):
+            folder = os.path.join(work_folder, f"ProdAPP{seed:02d}")
+            # Each server hands out its own RRNumbers, as the real ones do
+            generate_logs(folder, args.size_mb, seed=seed, prefix=f"ProdAPP{seed:02d}_log", first_serial=seed * 10000000)
+            server_folders.append(folder)
+        mismatches = []
+        for name in names:
+            mismatches += check_report(name, server_folders, work_folder)
+    finally:
+        os.chdir(current_folder)
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    if mismatches:
+        listed = ", ".join(f"{key} ({os.path.basename(folder)})" for key, folder in mismatches[:10])
+        raise SystemExit(f"{len(mismatches)} rows differ with --sources, e.g. {listed}")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
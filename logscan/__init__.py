@@ -0,0 +1 @@
+# Shared scanning helpers used by the log reading scripts
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+
+from logscan.reader import complete_end
+
+# Default upper bound of the cache file, in MB
+CACHE_MB = 2048
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    key TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    used REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+"""
+
+
+# Content fingerprint of the first `length` bytes of a file
+def file_fingerprint(file_path, length, block_size=8 * 1024 * 1024):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as raw_file:
+        remaining = length
+        while remaining > 0:
+            block = raw_file.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return f"{length}:{digest.hexdigest()}"
+
+
+# SQLite cache of the scan results of whole log files, keyed by the file
+# content fingerprint plus the extractor definition (`key`), so a file is
+# only parsed again when it or the patterns change, whatever its name, the
+# terminals or the time window asked for. Results are stored as compressed
+# pickles; once the cache grows past max_bytes the least recently used scans
+# are dropped.
+#
+# It is used in place of a CheckpointStore by map_file_ranges: resume() hands
+# out the cached results of a file (nothing left to scan) or asks for a full
+# scan, and update() stores the new results. Fingerprints are remembered per
+# path, size and mtime so unchanged files aren't read again to be recognised.
+class ScanCache:
+    def __init__(self, path, key, width, max_bytes=CACHE_MB * 1024 * 1024):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.key = key
+        self.width = width  # Results per range that belong in the cache
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path)
+        self.db.executescript(_SCHEMA)
+        self.fingerprints = {}  # file path -> (complete length, fingerprint) of this run
+        self.hits = 0
+        self.misses = 0
+
+    def _fingerprint(self, file_path):
+        stat = os.stat(file_path)
+        stamp = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        abs_path = os.path.abspath(file_path)
+        row = self.db.execute("SELECT length, fingerprint FROM files WHERE path = ? AND stamp = ?", (abs_path, stamp)).fetchone()
+        if row is not None:
+            return row
+        length = complete_end(file_path)  # A half-written last line is left for the next run
+        fingerprint = file_fingerprint(file_path, length)
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (abs_path, stamp, length, fingerprint))
+        return length, fingerprint
+
+    # (start, end, cached results) for the next scan of file_path
+    def resume(self, file_path):
+        length, fingerprint = self._fingerprint(file_path)
+        self.fingerprints[file_path] = (length, fingerprint)
+        row = self.db.execute("SELECT data FROM scans WHERE key = ?", (self._entry_key(fingerprint),)).fetchone()
+        if row is None:
+            self.misses += 1
+            return 0, length, []
+        self.hits += 1
+        self.db.execute("UPDATE scans SET used = ? WHERE key = ?", (time.time(), self._entry_key(fingerprint)))
+        return length, length, pickle.loads(zlib.decompress(row[0]))
+
+    def _entry_key(self, fingerprint):
+        return f"{fingerprint}:{self.key}"
+
+    # Store the results of a file just scanned up to `end`
+    def update(self, file_path, end, results):
+        length, fingerprint = self.fingerprints[file_path]
+        if end != length:
+            return
+        data = zlib.compress(pickle.dumps([list(range_results[:self.width]) for range_results in results], protocol=pickle.HIGHEST_PROTOCOL))
+        self.db.execute("INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?)", (self._entry_key(fingerprint), len(data), time.time(), data))
+        self._evict()
+        self.db.commit()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(bytes), 0) FROM scans").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, bytes FROM scans ORDER BY used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM scans WHERE key = ?", (key,))
+            total -= size
+
+    # Forget the fingerprints of files that are gone and close the cache,
+    # giving the space of dropped scans back once it is a quarter of the file
+    def save(self, keep_paths=None):
+        known = [row[0] for row in self.db.execute("SELECT path FROM files")]
+        for path in known:
+            if not os.path.exists(path):
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.db.commit()
+        page_count = self.db.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self.db.execute("PRAGMA freelist_count").fetchone()[0]
+        if free_pages > page_count // 4:
+            self.db.execute("VACUUM")
+        self.db.close()
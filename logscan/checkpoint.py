@@ -0,0 +1,120 @@
+import hashlib
+import os
+import pickle
+
+from logscan.reader import complete_end, is_compressed
+
+# How much of the start of a file is hashed to recognise it on the next run
+HEAD_BYTES = 64 * 1024
+
+
+# Identity of a scan configuration (script + patterns). Checkpoints written
+# with a different configuration are thrown away instead of being reused.
+def config_key(script_name, *pattern_sets):
+    digest = hashlib.sha1(script_name.encode("utf-8"))
+    for pattern_set in pattern_sets:
+        if isinstance(pattern_set, dict):
+            pattern_set = sorted((name, pattern.pattern) for name, pattern in pattern_set.items())
+        digest.update(repr(pattern_set).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _head_digest(file_path, offset):
+    with open(file_path, 'rb') as raw_file:
+        return hashlib.sha1(raw_file.read(min(offset, HEAD_BYTES))).hexdigest()
+
+
+# Sidecar store of per-file scan progress, so a rerun only scans the bytes
+# appended to each log since the last run and the reports only get the rows
+# completed since.
+#
+# For every file it keeps the inode, size and mtime, the offset up to which the
+# file has been fully scanned and a hash of the file head. Next to them it
+# keeps what each report needs to go on (see run_reports): its running
+# counters (SrNo, the keys reported ...) and the transactions still open at the
+# offsets of the files it read last, so they continue when the appended bytes
+# are scanned, and with --sources the events of those files not merged yet.
+# Nothing already reported is kept, so the store stays small however big the
+# files get.
+#
+# A file whose inode changed, that shrank below the offset, or whose head no
+# longer matches (rotation, truncation) is scanned again from byte 0, and so is
+# a compressed log that changed at all; transactions left open in it are then
+# not continued.
+class CheckpointStore:
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.entries = {}
+        self.continued = set()  # Files this run goes on with from their offset
+        self.stream = []        # Files the reports read last, their transactions still open
+        self.report_states = None  # What each report handed to save(), None on a first run
+        self.held = None  # Events of the stream files not handed to the reports yet
+        if os.path.exists(path):
+            # The reports were opened to append to; starting over would write
+            # every row again
+            try:
+                with open(path, 'rb') as file:
+                    stored = pickle.load(file)
+            except (OSError, EOFError, pickle.UnpicklingError) as error:
+                raise SystemExit(f"{path} can't be read ({error}); remove it (and the reports it added rows to) to start over")
+            if stored.get("key") != key:
+                raise SystemExit(f"{path} was written by a run with other options or patterns; "
+                                 "remove it (and the reports it added rows to) to start over")
+            self.entries = stored["files"]
+            self.stream = stored["stream"]
+            self.report_states = stored["reports"]
+            self.held = stored["held"]
+
+    # (start, end, no earlier results) for the next scan of file_path
+    def resume(self, file_path):
+        end = complete_end(file_path)
+        path = os.path.abspath(file_path)
+        entry = self.entries.get(path)
+        if entry is None or not self._same_file(file_path, entry, end):
+            return 0, end, []
+        self.continued.add(path)
+        return entry["offset"], end, []
+
+    def _same_file(self, file_path, entry, end):
+        stat = os.stat(file_path)
+        if (stat.st_dev, stat.st_ino) != entry["inode"]:
+            return False
+        if end < entry["offset"] or (is_compressed(file_path) and end != entry["offset"]):
+            return False  # A compressed log can't be resumed part way
+        return _head_digest(file_path, entry["offset"]) == entry["head"]
+
+    # Whether the transactions left open in `file_paths` by the last run go on:
+    # every one of the files is continued from its offset
+    def continues(self, file_paths):
+        return bool(file_paths) and all(os.path.abspath(file_path) in self.continued for file_path in file_paths)
+
+    # Record that file_path has been scanned up to `end` (its results go to
+    # the reports, not the store)
+    def update(self, file_path, end, results):
+        stat = os.stat(file_path)
+        self.entries[os.path.abspath(file_path)] = {
+            "inode": (stat.st_dev, stat.st_ino),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "offset": end,
+            "head": _head_digest(file_path, end),
+        }
+
+    # Write the store with the state of every report, the files they read last
+    # (`stream`) and the events of those held back from them, dropping files
+    # that are no longer in `keep_paths`
+    def save(self, keep_paths=None, report_states=None, stream=(), held=None):
+        if keep_paths is not None:
+            keep = {os.path.abspath(file_path) for file_path in keep_paths}
+            self.entries = {path: entry for path, entry in self.entries.items() if path in keep}
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        stored = {"key": self.key, "files": self.entries, "stream": list(stream), "reports": report_states,
+                  "held": held}
+        with open(temp_path, 'wb') as file:
+            pickle.dump(stored, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)  # Never leave a half-written store behind
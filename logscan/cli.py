@@ -0,0 +1,266 @@
+import argparse
+import os
+
+from logscan import stats
+from logscan.cache import CACHE_MB, ScanCache
+from logscan.checkpoint import CheckpointStore
+from logscan.dedup import SeenKeys
+from logscan.output import APPENDABLE_FORMATS, SINKS, open_sink, report_path
+from logscan.reader import CHUNK_SIZE
+from logscan.shard import SHARD_BY, SHARD_INTO, SHARD_ROWS, ShardedSink
+from logscan.summary import SUMMARY_COLUMNS, SummarySink
+from logscan.window import TimeWindow, WindowSink, parse_time
+
+
+# Command line options shared by all the log reading scripts
+def build_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of worker processes parsing log files (0 = one per CPU, default 1)",
+    )
+    parser.add_argument(
+        "--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024),
+        help="With several workers, split files bigger than this many MB into ranges scanned in parallel",
+    )
+    parser.add_argument(
+        "--engine", choices=("text", "bytes"), default="text",
+        help="text decodes every line; bytes scans the mmapped file and decodes only captured values",
+    )
+    parser.add_argument(
+        "--checkpoint", metavar="FILE",
+        help="Keep per-file scan progress in FILE so reruns only scan what was appended to each log and only add the rows completed since",
+    )
+    parser.add_argument(
+        "--follow", action="store_true",
+        help="Keep following the newest log file (and the next one after each hourly rotation), writing rows as they complete",
+    )
+    parser.add_argument(
+        "--from-start", action="store_true",
+        help="With --follow, read the current log file from its beginning instead of its end",
+    )
+    parser.add_argument(
+        "--format", choices=tuple(SINKS),
+        help="Report format: xlsx, csv, jsonl, or typed columns for analytics in parquet / arrow (default xlsx, or jsonl with --follow)",
+    )
+    parser.add_argument(
+        "--output", metavar="FILE",
+        help="Where the report is written (default the usual report file with the format's extension; stdout with --follow)",
+    )
+    parser.add_argument(
+        "--shard-by", choices=SHARD_BY,
+        help="Split the report: into parts of --shard-rows rows, or per terminal or per day (parts past --shard-rows too), listed with their row counts in an index",
+    )
+    parser.add_argument(
+        "--shard-into", choices=SHARD_INTO, default="workbooks",
+        help="With --shard-by, write the shards as files of their own, in parallel with --workers, or as sheets of one xlsx workbook (default %(default)s)",
+    )
+    parser.add_argument(
+        "--shard-rows", type=int, default=SHARD_ROWS,
+        help="With --shard-by, rows of one shard at most (default %(default)s, the most an Excel sheet holds)",
+    )
+    parser.add_argument(
+        "--summary", action="store_true",
+        help="Write p50/p95/p99/max latency and counts per time bucket, terminal, TxnType/SubTxnType and stage instead of one row per transaction",
+    )
+    parser.add_argument(
+        "--bucket-minutes", type=int, default=60,
+        help="With --summary, length of the time buckets in minutes (default 60)",
+    )
+    parser.add_argument(
+        "--sketch", metavar="FILE",
+        help="With --summary, also save this run's latency sketches to FILE",
+    )
+    parser.add_argument(
+        "--merge-sketch", metavar="FILE", action="append", default=[],
+        help="With --summary, merge sketches saved by earlier runs (--sketch) into the summary; can be repeated",
+    )
+    parser.add_argument(
+        "--cache", metavar="FILE",
+        help="Keep the parsed content of every log file (all terminals, all fields) in this SQLite file; files are parsed again only when they or the patterns change",
+    )
+    parser.add_argument(
+        "--cache-mb", type=int, default=CACHE_MB,
+        help="With --cache, drop the least recently used files once the cache is bigger than this many MB (default %(default)s)",
+    )
+    parser.add_argument(
+        "--from", dest="from_time", metavar="TIME", type=_time_argument,
+        help="Only read what was logged from TIME on, e.g. \"2025-01-07 17:20\" (files of other hours are skipped, the rest binary searched)",
+    )
+    parser.add_argument(
+        "--to", dest="to_time", metavar="TIME", type=_time_argument,
+        help="Only read what was logged before TIME, e.g. \"2025-01-07 17:35\"",
+    )
+    parser.add_argument(
+        "--margin", type=float, default=30, metavar="SECONDS",
+        help="With --from / --to, also read this many seconds on each side for transactions in flight at the edges (default %(default)s)",
+    )
+    parser.add_argument(
+        "--sources", metavar="FOLDER", nargs="+",
+        help="Log folders of several app servers (ProdAPP01 ... ProdAPP08) instead of logs; each hour's lines of all of them are merged by time into one stream",
+    )
+    parser.add_argument(
+        "--seen-keys", metavar="FILE",
+        help="Remember the RRNs / serial numbers already reported in FILE, so later runs skip their duplicates too",
+    )
+    parser.add_argument(
+        "--stats", action="store_true",
+        help="Print at exit the wall/CPU time of each stage, lines read, lines past the prefilter, hits per field, transactions opened/completed/dropped and MB/s per file",
+    )
+    parser.add_argument(
+        "--stats-json", metavar="FILE",
+        help="Also write the --stats figures to FILE as JSON (implies --stats)",
+    )
+    parser.add_argument(
+        "--profile", metavar="FILE",
+        help="Run under cProfile, save the profile to FILE and print the top functions (main process only)",
+    )
+    parser.add_argument(
+        "--tracemalloc", action="store_true",
+        help="Trace memory allocations and print the top allocation sites (main process only)",
+    )
+    return parser
+
+
+def _time_argument(text):
+    try:
+        return parse_time(text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+
+CACHE_WITH_CHECKPOINT = "--cache and --checkpoint can't be combined; --cache already keeps the scan of every file"
+
+
+# ScanCache for the --cache option (see open_checkpoints)
+def open_cache(args, key, width):
+    if args.checkpoint:
+        raise SystemExit(CACHE_WITH_CHECKPOINT)
+    return ScanCache(args.cache, key, width, max(args.cache_mb, 1) * 1024 * 1024)
+
+
+# TimeWindow of the --from / --to options, or None when neither is given
+def open_window(args):
+    if args.from_time is None and args.to_time is None:
+        return None
+    return TimeWindow(args.from_time, args.to_time, int(max(args.margin, 0) * 1000))
+
+
+# CheckpointStore for the --checkpoint option, or None when it isn't given
+def open_checkpoints(args, key):
+    if not args.checkpoint:
+        return None
+    return CheckpointStore(args.checkpoint, key)
+
+
+# The Stats collecting figures for --stats / --stats-json, or None when neither
+# is given
+def open_stats(args):
+    if not (args.stats or args.stats_json):
+        return None
+    return stats.enable()
+
+
+# SeenKeys a report deduplicates against: the one saved by earlier runs in
+# --seen-keys (name_suffix in front of its extension) if there is one, else
+# an empty one
+def open_seen_keys(args, name_suffix=""):
+    if not args.seen_keys:
+        return SeenKeys()
+    if args.checkpoint:
+        raise SystemExit("--seen-keys can't be combined with --checkpoint, which already keeps the keys reported by earlier runs")
+    path = _with_suffix(args.seen_keys, name_suffix)
+    if os.path.exists(path):
+        return SeenKeys.load(path)
+    return SeenKeys()
+
+
+# Keep the keys seen by this run for the next ones (--seen-keys)
+def save_seen_keys(args, seen, name_suffix=""):
+    if args.seen_keys:
+        seen.save(_with_suffix(args.seen_keys, name_suffix))
+
+
+# Byte size of the --chunk-mb option
+def chunk_size(args):
+    return max(args.chunk_mb, 1) * 1024 * 1024
+
+
+# Row sink for a batch report: --format (default xlsx) written to --output, or
+# to default_path with the extension of the format. name_suffix goes in front
+# of the extension, for scripts writing several reports in one run. With
+# --summary the rows only feed the latency summary, written there instead.
+#
+# A --checkpoint rerun only has the rows completed since the last run: they
+# are appended to a csv / jsonl report, other formats get a new file. Reports
+# written whole from what the checkpoint keeps (rewritten) are opened as usual.
+def open_report(args, columns, default_path, sheet_title, bold_header=False, name_suffix="", rewritten=False):
+    if args.cache and args.checkpoint:
+        raise SystemExit(CACHE_WITH_CHECKPOINT)  # Before any report file is created
+    append = False
+    if args.checkpoint and not rewritten:
+        if args.summary:
+            raise SystemExit("--summary sums up the rows of a run, and a --checkpoint rerun only has the new ones; "
+                             "save each run's --sketch and --merge-sketch them instead")
+        if args.shard_by:
+            raise SystemExit("--shard-by writes whole shards; it can't be combined with --checkpoint, whose reruns only add new rows")
+        append = os.path.exists(args.checkpoint)
+    sink = _open_report(args, columns, default_path, sheet_title, bold_header, name_suffix, append)
+    window = open_window(args)
+    if window is not None:
+        sink = WindowSink(sink, window)
+    run_stats = open_stats(args)
+    if run_stats is not None:
+        return stats.TimedSink(sink, run_stats)
+    return sink
+
+
+def _open_report(args, columns, default_path, sheet_title, bold_header, name_suffix, append):
+    output_format = args.format or "xlsx"
+    if args.shard_by and args.summary:
+        raise SystemExit("--summary writes a few rows per time bucket; it can't be combined with --shard-by")
+    if not args.summary:
+        output_path = args.output or report_path(default_path, output_format)
+        if append:
+            output_path = _with_suffix(output_path, name_suffix)
+            if output_format in APPENDABLE_FORMATS:
+                return open_sink(output_format, output_path, columns, sheet_title, bold_header, append=True)
+            if os.path.exists(output_path):
+                raise SystemExit(f"--checkpoint adds each rerun's new rows to the report and {output_format} files can't be "
+                                 "appended to; use --format csv or jsonl, or leave out --output for a new report file per run")
+            return open_sink(output_format, output_path, columns, sheet_title, bold_header)
+        if args.shard_by:
+            return ShardedSink(output_format, _with_suffix(output_path, name_suffix), columns, sheet_title, bold_header,
+                               args.shard_by, args.shard_into, args.shard_rows, args.workers)
+        return open_sink(output_format, _with_suffix(output_path, name_suffix), columns, sheet_title, bold_header)
+
+    if args.output:
+        output_path = _with_suffix(args.output, name_suffix)
+    else:
+        output_path = _with_suffix(report_path(default_path, output_format), name_suffix + "_Summary")
+    sketch_path = _with_suffix(args.sketch, name_suffix) if args.sketch else None
+    sink = open_sink(output_format, output_path, SUMMARY_COLUMNS, "Latency Summary", bold_header)
+    return SummarySink(sink, max(args.bucket_minutes, 1) * 60 * 1000, sketch_path, args.merge_sketch)
+
+
+def _with_suffix(path, name_suffix):
+    if not name_suffix:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}{name_suffix}{extension}"
+
+
+# Row sink for --follow: --format (default jsonl) written to --output or stdout
+def open_follow_sink(args, columns):
+    if args.from_time is not None or args.to_time is not None:
+        raise SystemExit("--from / --to read a past time window; they can't be combined with --follow")
+    if args.sources:
+        raise SystemExit("--follow follows the logs folder; it can't be combined with --sources")
+    if args.cache:
+        raise SystemExit("--cache keeps the scans of whole files; it can't be combined with --follow")
+    if args.shard_by:
+        raise SystemExit("--follow writes one stream of rows; it can't be combined with --shard-by")
+    output_format = args.format or "jsonl"
+    if output_format not in ("csv", "jsonl"):
+        raise SystemExit("--follow writes rows as they complete; use --format csv or jsonl")
+    return SINKS[output_format](args.output, columns, flush=True)  # Each row is seen as soon as it completes
@@ -0,0 +1,111 @@
+import calendar
+from datetime import datetime
+
+from logscan.timestamps import DURATION_COLUMNS, TIME_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for --format parquet / arrow
+    pa = None
+    pq = None
+
+# Rows buffered before they are written out as one Parquet row group / Arrow
+# record batch, so memory stays bounded however many transactions there are
+ROW_GROUP_SIZE = 64 * 1024
+
+# Report columns with few distinct values, stored dictionary-encoded
+DICTIONARY_COLUMNS = {"DeviceSerialNumber", "TxnType", "SubTxnType", "FilePath", "UserName", "Stage"}
+
+# Report columns stored as int64 (the latency summary's counts and ms too)
+INTEGER_COLUMNS = {"SrNo", "Count", "P50", "P95", "P99", "Max"}
+
+
+# Epoch milliseconds of a time column value: rows keep log times as int ms
+# already; full "YYYY-MM-DD HH:MM:SS" text (the SSL report) is parsed
+def time_ms(value):
+    if isinstance(value, int):
+        return value
+    if not value or len(value) < 19 or value[4] != "-":
+        return None
+    try:
+        parsed = datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+    return calendar.timegm(parsed.timetuple()) * 1000
+
+
+# Arrow type of a report column
+def column_type(column):
+    if column in TIME_COLUMNS:
+        return pa.int64()
+    if column in DURATION_COLUMNS:
+        return pa.int32()
+    if column in DICTIONARY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if column in INTEGER_COLUMNS:
+        return pa.int64()
+    return pa.string()
+
+
+# Writes rows as typed columns, ROW_GROUP_SIZE rows at a time
+class _ColumnarSink:
+    def __init__(self, output_path, columns, sheet_title=None, bold_header=False):
+        if pa is None:
+            raise SystemExit("--format parquet/arrow needs pyarrow: pip install pyarrow")
+        self.path = output_path
+        self.columns = columns
+        self.schema = pa.schema([(col, column_type(col)) for col in columns])
+        self.buffer = {col: [] for col in columns}
+        self.buffered = 0
+        self.writer = None
+
+    def write(self, row):
+        for col in self.columns:
+            value = row.get(col)
+            if col in TIME_COLUMNS:
+                value = time_ms(value)
+            elif col in DURATION_COLUMNS:
+                value = value if isinstance(value, int) else None
+            elif col in INTEGER_COLUMNS:
+                value = int(value) if value not in (None, "") else None
+            elif value is not None:
+                value = str(value)
+            self.buffer[col].append(value)
+        self.buffered += 1
+        if self.buffered >= ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.buffered:
+            return
+        batch = pa.record_batch([pa.array(self.buffer[col], type=self.schema.field(col).type) for col in self.columns], schema=self.schema)
+        if self.writer is None:
+            self.writer = self.open_writer()
+        self.write_batch(batch)
+        self.buffer = {col: [] for col in self.columns}
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        if self.writer is None:
+            self.writer = self.open_writer()  # Still write the schema for an empty report
+        self.writer.close()
+
+
+# Parquet file, one row group per ROW_GROUP_SIZE rows
+class ParquetSink(_ColumnarSink):
+    def open_writer(self):
+        return pq.ParquetWriter(self.path, self.schema)
+
+    def write_batch(self, batch):
+        self.writer.write_table(pa.Table.from_batches([batch]))
+
+
+# Arrow IPC (Feather v2) file, one record batch per ROW_GROUP_SIZE rows
+class ArrowSink(_ColumnarSink):
+    def open_writer(self):
+        return pa.ipc.new_file(self.path, self.schema)
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch)
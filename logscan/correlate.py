@@ -0,0 +1,117 @@
+from collections import OrderedDict, deque
+
+# An open transaction that logs nothing for this long (ms) is evicted
+OPEN_TIMEOUT_MS = 5 * 60 * 1000
+
+# At most this many transactions are kept open; past it the least recently
+# active one is evicted
+MAX_OPEN = 50000
+
+
+class _Slot:
+    __slots__ = ("state", "row", "done", "last_seen", "ending")
+
+    def __init__(self, state):
+        self.state = state
+        self.row = None
+        self.done = False
+        self.last_seen = None
+        self.ending = False
+
+
+# Streaming grouping of interleaved log events by correlation id (the
+# transaction UUID), so memory depends on how many transactions are open at
+# once instead of on the size of the log.
+#
+# Each id gets its own state from new_state(): state.update(values,
+# event_ms) takes the events of that id as they come and state.finish()
+# returns its row, or None. An id is finished grace_ms after its end event, so
+# lines logged right after "Transaction End" (the response JSON ...) still
+# count. Ids that log nothing for timeout_ms, or the least recently active ones
+# once more than max_open are open, are evicted: finished as they are, and
+# counted in `evicted`.
+#
+# `now` is whatever clock the caller goes by (log time in ms for a batch run,
+# the wall clock for --follow); it only has to grow. With ordered=True rows are
+# handed out in the order their ids were first seen, otherwise as soon as they
+# are finished.
+class Correlator:
+    def __init__(self, new_state, grace_ms, timeout_ms=OPEN_TIMEOUT_MS, max_open=MAX_OPEN, ordered=True):
+        self.new_state = new_state
+        self.grace_ms = grace_ms
+        self.timeout_ms = timeout_ms
+        self.max_open = max_open
+        self.ordered = ordered
+        self.open = OrderedDict()  # id -> slot, least recently active first
+        self.ended = deque()       # (end time, id, slot) in the order the ends were seen
+        self.pending = deque()     # slots in first-seen order whose rows are not out yet
+        self.ready = []            # finished rows not handed out yet (ordered=False)
+        self.now = 0
+        self.evicted = 0
+
+    # Take one event of transaction `key`; returns the rows that are now ready
+    def feed(self, key, values, event_ms, now=None, end=False):
+        slot = self.open.get(key)
+        if slot is None:
+            slot = _Slot(self.new_state())
+            self.open[key] = slot
+            if self.ordered:
+                self.pending.append(slot)
+        else:
+            self.open.move_to_end(key)
+
+        if now is not None and now > self.now:
+            self.now = now
+        slot.last_seen = self.now
+        slot.state.update(values, event_ms)
+        if end and not slot.ending:
+            slot.ending = True
+            self.ended.append((self.now, key, slot))
+        return self.advance()
+
+    # Let the clock move on to `now` (e.g. while the log is quiet); returns the
+    # rows that are now ready
+    def advance(self, now=None):
+        if now is not None and now > self.now:
+            self.now = now
+
+        while self.ended and self.ended[0][0] + self.grace_ms <= self.now:
+            _, key, slot = self.ended.popleft()
+            if self.open.get(key) is slot:
+                self._finish(key, slot)
+
+        while self.open:
+            key, slot = next(iter(self.open.items()))
+            if slot.last_seen + self.timeout_ms > self.now and len(self.open) <= self.max_open:
+                break
+            self._finish(key, slot)
+            self.evicted += 1
+
+        return self._take_ready()
+
+    # Finish every transaction still open (end of a file); returns the
+    # remaining rows
+    def flush(self):
+        while self.open:
+            key, slot = next(iter(self.open.items()))
+            self._finish(key, slot)
+        self.ended.clear()
+        return self._take_ready()
+
+    def _finish(self, key, slot):
+        del self.open[key]
+        slot.row = slot.state.finish()
+        slot.done = True
+        if not self.ordered and slot.row is not None:
+            self.ready.append(slot.row)
+
+    def _take_ready(self):
+        if self.ordered:
+            rows = []
+            while self.pending and self.pending[0].done:
+                row = self.pending.popleft().row
+                if row is not None:
+                    rows.append(row)
+            return rows
+        rows, self.ready = self.ready, []
+        return rows
@@ -0,0 +1,88 @@
+import os
+import pickle
+from array import array
+from hashlib import blake2b
+
+# Slots of a new, empty set (a power of two)
+INITIAL_CAPACITY = 1 << 12
+
+
+# 64-bit fingerprint of a key; 0 marks an empty slot so it is never one.
+# Two keys share a fingerprint with a chance of about n² / 2^65 (n keys), so
+# a month of RRNs can in practice be told apart by fingerprint alone.
+def _fingerprint(key):
+    fingerprint = int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    return fingerprint or 1
+
+
+# Set of the keys (RRNs, serial numbers ...) already reported, across all
+# files of a run and, saved with save(), across runs. Only a 64-bit
+# fingerprint of each key is kept, in an open-addressing table packed in an
+# array of unsigned 64-bit integers: about 16 bytes per key instead of the
+# ~100 of a Python set of strings. Sets built apart (by parallel workers,
+# other days) are combined with merge().
+class SeenKeys:
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.table = array("Q", bytes(8 * capacity))
+        self.size = 0
+
+    # Record a key; returns True when it was not seen before
+    def add(self, key):
+        return self._insert(_fingerprint(key))
+
+    def __contains__(self, key):
+        fingerprint = _fingerprint(key)
+        table = self.table
+        mask = len(table) - 1
+        i = fingerprint & mask
+        while True:
+            slot = table[i]
+            if slot == fingerprint:
+                return True
+            if slot == 0:
+                return False
+            i = (i + 1) & mask
+
+    def __len__(self):
+        return self.size
+
+    def _insert(self, fingerprint):
+        table = self.table
+        mask = len(table) - 1
+        i = fingerprint & mask
+        while True:
+            slot = table[i]
+            if slot == fingerprint:
+                return False
+            if slot == 0:
+                break
+            i = (i + 1) & mask
+        table[i] = fingerprint
+        self.size += 1
+        if self.size * 2 > len(table):  # Kept at most half full so probes stay short
+            self._grow()
+        return True
+
+    def _grow(self):
+        old_table = self.table
+        self.table = array("Q", bytes(16 * len(old_table)))
+        self.size = 0
+        for fingerprint in old_table:
+            if fingerprint:
+                self._insert(fingerprint)
+
+    def merge(self, other):
+        for fingerprint in other.table:
+            if fingerprint:
+                self._insert(fingerprint)
+
+    def save(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as file:
+            return pickle.load(file)
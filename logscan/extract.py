@@ -0,0 +1,409 @@
+import os
+import time
+from collections import Counter
+from functools import partial
+from itertools import chain
+
+from logscan import stats
+from logscan.checkpoint import config_key
+from logscan.cli import chunk_size, open_cache, open_checkpoints, open_stats, open_window
+from logscan.matcher import TRANSACTION_LOGGERS, LineMatcher, encode_pattern
+from logscan.memory import report_peak_rss
+from logscan.merge import hour_groups, merge_events, reached_times, source_keyed, split_settled
+from logscan.parallel import map_file_ranges
+from logscan.reader import is_compressed, iter_byte_lines, iter_byte_lines_containing, iter_lines, list_log_files, to_text
+from logscan.timestamps import TIMESTAMP_PATTERN, line_ms
+
+
+# Value of one field hit: None for a pure marker (the line time is what
+# counts), the captured text for one group, a tuple of them for several
+def _hit_value(match):
+    groups = match.re.groups
+    if not groups:
+        return None
+    if groups == 1:
+        return to_text(match.group(1))
+    return tuple(to_text(group) for group in match.groups())
+
+
+# Declarative definition of what one report takes from the log lines.
+#
+# - patterns: field -> regex, all matched in one pass by a LineMatcher (only
+#   lines of the `prefilter` loggers, unless it is None). The first hit of
+#   each field on a line counts; fields without a group just mark the line.
+# - markers: field -> plain text marking the line wherever it comes from
+#   (e.g. "Transaction End"), checked without the prefilter.
+# - key: regex whose group 1 is the correlation key (transaction UUID ...) of
+#   a line; lines without one are skipped.
+# - allowed: field -> captured values to keep; hits of the field with any
+#   other value are dropped (e.g. only the requested terminals).
+# - summarize: summarize(file_path, events) turns the events of a scanned
+#   range into what the report merges (instead of the events themselves).
+#
+# Every line with a hit becomes one event (key or None, field -> value,
+# int epoch-ms time of the line). Any number of extractors can share one scan
+# of a file through scan_range.
+class Extractor:
+    def __init__(self, name, patterns, markers=None, key=None, allowed=None, prefilter=TRANSACTION_LOGGERS, summarize=None):
+        self.name = name
+        self.patterns = patterns
+        self.markers = dict(markers or {})
+        self.key = key
+        self.allowed = {field: frozenset(values) for field, values in (allowed or {}).items()}
+        self.prefilter = prefilter
+        self.summarize = summarize
+
+        self.matcher = LineMatcher(patterns, prefilter)
+        self.matcher_bytes = LineMatcher(patterns, prefilter, binary=True)
+        self.markers_bytes = {field: marker.encode("utf-8") for field, marker in self.markers.items()}
+        self.key_bytes = encode_pattern(key) if key is not None else None
+
+    # Byte literals a line must contain to give an event, or None when every
+    # line has to be looked at
+    def literals(self):
+        if self.matcher_bytes.literals is None:
+            return None
+        return self.matcher_bytes.literals + list(self.markers_bytes.values())
+
+    # The event of one log line (str, or bytes with binary=True), or None
+    def scan_line(self, line, binary=False):
+        if binary:
+            matcher, markers, key = self.matcher_bytes, self.markers_bytes, self.key_bytes
+        else:
+            matcher, markers, key = self.matcher, self.markers, self.key
+
+        values = {field: _hit_value(match) for field, match in matcher.match(line).items()}
+        for field, allowed in self.allowed.items():
+            if field in values and values[field] not in allowed:
+                del values[field]
+        for field, marker in markers.items():
+            if marker in line:
+                values[field] = None
+        if not values:
+            return None  # Nothing this report tracks on this line
+
+        key_value = None
+        if key is not None:
+            m = key.search(line)
+            if not m:
+                return None
+            key_value = to_text(m.group(1))
+        return key_value, values, line_ms(line)
+
+    # Events of a stream of lines, e.g. the lines of a followed log
+    def scan(self, lines, binary=False):
+        for line in lines:
+            event = self.scan_line(line, binary)
+            if event is not None:
+                yield event
+
+    # The same extractor keeping the hits of every value (every terminal ...),
+    # as scans are cached for any of them
+    def without_allowed(self):
+        if not self.allowed:
+            return self
+        return Extractor(self.name, self.patterns, self.markers, self.key, None, self.prefilter, self.summarize)
+
+    # Events of a without_allowed() scan as this extractor would have found
+    # them, only those logged in time_range if given
+    def select(self, events, time_range=None):
+        if self.allowed:
+            events = [event for event in map(self._allowed_event, events) if event is not None]
+        if time_range is not None:
+            events = _in_time_range(events, *time_range)
+        return events
+
+    def _allowed_event(self, event):
+        key_value, values, ms = event
+        dropped = [field for field, allowed in self.allowed.items() if field in values and values[field] not in allowed]
+        if not dropped:
+            return event
+        values = {field: value for field, value in values.items() if field not in dropped}
+        return (key_value, values, ms) if values else None
+
+    # What a checkpoint of this extractor's results depends on
+    def config(self):
+        return [
+            self.name,
+            sorted((field, pattern.pattern) for field, pattern in self.patterns.items()),
+            sorted(self.markers.items()),
+            self.key.pattern if self.key is not None else None,
+            sorted((field, sorted(values)) for field, values in self.allowed.items()),
+            self.prefilter,
+            _callable_config(self.summarize),
+        ]
+
+
+# Name of a summarize function, with the arguments bound to it by a partial
+def _callable_config(func):
+    if isinstance(func, partial):
+        return [_callable_config(func.func), list(func.args), sorted(func.keywords.items())]
+    return getattr(func, "__name__", None)
+
+
+# Scan a log file (or the byte range [start, end) of it) once for several
+# extractors. Returns one result per extractor: its events, or their summary.
+# With the bytes engine only the lines holding a literal of some extractor
+# are cut out of the mmapped file. A `counters` Counter also gets the lines
+# read, the lines past each extractor's prefilter and the hits per field.
+# With time_range=(first, last) epoch ms (either None for an open side) only
+# events logged in [first, last) are kept. summarize=False leaves the events
+# of every extractor unsummarized.
+def scan_range(file_path, start=0, end=None, engine="text", extractors=(), counters=None, time_range=None, summarize=True):
+    binary = engine == "bytes"
+    if binary:
+        literals = []
+        for extractor in extractors:
+            extractor_literals = extractor.literals()
+            if extractor_literals is None:
+                literals = None
+                break
+            literals.extend(extractor_literals)
+        if literals is None:
+            lines = iter_byte_lines(file_path, start, end)
+        else:
+            lines = iter_byte_lines_containing(file_path, literals, start, end)
+    else:
+        lines = iter_lines(file_path, start, end)
+
+    found = [[] for _ in extractors]
+    if counters is None:
+        scanners = [(extractor.scan_line, events.append) for extractor, events in zip(extractors, found)]
+        for line in lines:
+            for scan_line, add in scanners:
+                event = scan_line(line, binary)
+                if event is not None:
+                    add(event)
+    else:
+        _scan_counting(lines, binary, extractors, found, counters)
+    if time_range is not None:
+        found = [_in_time_range(events, *time_range) for events in found]
+
+    return [
+        extractor.summarize(file_path, events) if summarize and extractor.summarize is not None else events
+        for extractor, events in zip(extractors, found)
+    ]
+
+
+# The scan loop of scan_range for --stats, kept apart so counting costs
+# nothing otherwise. With the bytes engine "lines read" are the lines cut out
+# around a literal, not every line of the file.
+def _scan_counting(lines, binary, extractors, found, counters):
+    for line in lines:
+        counters["scan", "lines read"] += 1
+        for extractor, events in zip(extractors, found):
+            matcher = extractor.matcher_bytes if binary else extractor.matcher
+            if matcher.accepts(line):
+                counters[extractor.name, "lines past prefilter"] += 1
+            event = extractor.scan_line(line, binary)
+            if event is not None:
+                events.append(event)
+                for field in event[1]:
+                    counters[extractor.name, f"hits {field}"] += 1
+
+
+def _in_time_range(events, first, last):
+    return [
+        event for event in events
+        if event[2] is None or ((first is None or event[2] >= first) and (last is None or event[2] < last))
+    ]
+
+
+# scan_range for --stats: the results come with one more item, what the scan
+# of the range took and counted (see Stats.add_range)
+def scan_range_stats(file_path, start=0, end=None, engine="text", extractors=(), time_range=None, summarize=True):
+    counters = Counter()
+    wall, cpu = time.perf_counter(), time.process_time()
+    results = scan_range(file_path, start, end, engine, extractors, counters, time_range, summarize)
+    if end is None or is_compressed(file_path):
+        size = os.path.getsize(file_path) - start
+    else:
+        size = end - start
+    results.append({
+        "file": file_path,
+        "bytes": size,
+        "wall": time.perf_counter() - wall,
+        "cpu": time.process_time() - cpu,
+        "counters": counters,
+    })
+    return results
+
+
+# Run several reports over one scan of the log folder. A report has an
+# `extractor`, takes the results of each file with add_file(file_path,
+# [result of each scanned range]) in file order, and writes itself out on
+# close(). Files (and ranges of big files) are scanned in parallel but merged
+# back in order. With --from / --to only the files and byte ranges of that
+# time window are read.
+#
+# With --sources (the log folders of several app servers) the files of one
+# hour are scanned in parallel as usual, then their events are merged by log
+# time into one stream, so a terminal whose transaction moves between nodes is
+# followed across them. Reports then get one add_file per hour, with the
+# files' paths joined by " + ", and summarizing extractors summarize the
+# merged stream.
+#
+# With --checkpoint a rerun only scans what was appended to the files, and a
+# report only gets add_file calls for the files (hours) with something new.
+# Before close() it hands what it needs to go on to suspend(): its running
+# counters (SrNo, the keys reported ...) and the transactions still open in
+# the file it got last, which it keeps open instead of finishing them at
+# close(). The next run gives that back to resume(state, continued) before
+# any add_file; continued is False when that file can't be continued
+# (rotated, truncated, gone), and the report then finishes what was open in it.
+# With --sources the servers' lines of the hour read last that may still be
+# preceded by lines of a server that is behind wait in the checkpoint too,
+# and are merged once it has caught up or the hour is over.
+def run_reports(args, reports, log_folder, script_name):
+    run_stats = open_stats(args)
+    with stats.profiled(args.profile, args.tracemalloc):
+        _run_reports(args, reports, log_folder, script_name, run_stats)
+    if run_stats is not None:
+        run_stats.report()
+        if args.stats_json:
+            run_stats.dump(args.stats_json)
+            print(f"Stats written to {args.stats_json}")
+
+
+def _run_reports(args, reports, log_folder, script_name, run_stats):
+    extractors = [report.extractor for report in reports]
+    if args.sources:
+        groups = hour_groups(args.sources)
+    else:
+        groups = [[file_path] for file_path in list_log_files(log_folder)]
+    log_files = [file_path for group in groups for file_path in group]
+    merged = bool(args.sources)
+    configs = [extractor.config() for extractor in extractors]
+    if merged:
+        configs.append("unsummarized")  # Summarizing extractors keep their events for the merge
+    checkpoints = open_checkpoints(args, config_key(script_name, {"Time": TIMESTAMP_PATTERN}, *configs))
+
+    # With --cache whole files are scanned for every terminal and left
+    # unsummarized; what each report asks for is picked from the results
+    cache = None
+    scan_extractors = extractors
+    if args.cache:
+        scan_extractors = [extractor.without_allowed() for extractor in extractors]
+        key = config_key("scan", {"Time": TIMESTAMP_PATTERN}, *(extractor.config() for extractor in scan_extractors), "unsummarized")
+        cache = checkpoints = open_cache(args, key, len(scan_extractors))
+
+    window = open_window(args)
+    time_range = None
+    if window is not None:
+        if checkpoints is not None and cache is None:
+            raise SystemExit("--from / --to read part of the logs; they can't be combined with --checkpoint")
+        groups = [group for group in (window.files(group) for group in groups) if group]
+        window_files = [file_path for group in groups for file_path in group]
+        stats.count("window", "files skipped by name", len(log_files) - len(window_files))
+        log_files, time_range = window_files, window.time_range()
+    # Events of the margin only complete the transactions in flight at the
+    # window's edges (rows outside it are dropped by the report's WindowSink);
+    # a summary has no such rows, so its extractor only gets the window's own
+    # events and summarizes them here rather than in the scan
+    select_ranges = [
+        window.exact_range() if window is not None and extractor.summarize is not None else time_range
+        for extractor in extractors
+    ]
+    scan = partial(scan_range if run_stats is None else scan_range_stats, engine=args.engine, extractors=scan_extractors,
+                   time_range=time_range if cache is None else None,
+                   summarize=not merged and cache is None and window is None)
+    file_results = map_file_ranges(scan, log_files, args.workers, chunk_size(args), checkpoints, window if cache is None else None)
+
+    resuming = checkpoints is not None and cache is None
+    stream = []  # The files the reports got last, whose transactions may still be open
+    held = None  # --sources: events of those files not merged yet (see _add_merged)
+    if resuming and checkpoints.report_states is not None:
+        continued = checkpoints.continues(checkpoints.stream)
+        stream, held = checkpoints.stream, checkpoints.held
+        for report, state in zip(reports, checkpoints.report_states):
+            report.resume(state, continued or held is not None)
+        if not continued:
+            if held is not None:
+                # What waited still belongs to those files: merged in before
+                # what they left open is finished, as resume() would have
+                _add_merged(reports, extractors, [(file_path, []) for file_path in stream], held)
+                for report in reports:
+                    report.resume(report.suspend(), False)
+            stream, held = [], None
+
+    for index, group in enumerate(groups):
+        group_results = []
+        for _ in group:
+            with stats.stage("wait for scan"):
+                file_path, range_results = next(file_results)
+            if run_stats is not None:
+                for results in range_results:
+                    # Ranges scanned by this run carry their stats; taken off
+                    # before the reports get the results
+                    if len(results) > len(extractors):
+                        run_stats.add_range(results.pop())
+            if cache is not None or window is not None:
+                range_results = [[
+                    extractor.select(chain.from_iterable(results[i] for results in range_results), select_ranges[i])
+                    for i, extractor in enumerate(extractors)
+                ]]
+            group_results.append((file_path, range_results))
+        if resuming and not any(range_results for _, range_results in group_results):
+            continue  # Read up to its end by earlier runs
+        if held is not None and group != stream:
+            # The hour read last is over: what waited can be merged
+            _add_merged(reports, extractors, [(file_path, []) for file_path in stream], held)
+            held = None
+        stream = group
+
+        with stats.stage("build + write rows"):
+            if merged:
+                held = _add_merged(reports, extractors, group_results, held, hold=resuming and index == len(groups) - 1)
+            else:
+                file_path, range_results = group_results[0]
+                for i, (report, extractor) in enumerate(zip(reports, extractors)):
+                    results = [results[i] for results in range_results]
+                    if (cache is not None or window is not None) and extractor.summarize is not None:
+                        results = [extractor.summarize(file_path, results[0])]
+                    report.add_file(file_path, results)
+
+    report_states = [report.suspend() for report in reports] if resuming else None
+    with stats.stage("build + write rows"):
+        for report in reports:
+            report.close()
+    if resuming:
+        checkpoints.save(log_files, report_states, stream, held)  # Only once the reports are written
+    elif checkpoints is not None:
+        checkpoints.save(log_files)
+    if cache is not None:
+        stats.count("cache", "files from the cache", cache.hits)
+        stats.count("cache", "files scanned", cache.misses)
+    report_peak_rss()
+
+
+# Hand the time-merged events of one hour of every server to the reports.
+# Events of extractors without a key are keyed by their server, so reports
+# build the transactions of each server apart.
+#
+# `held` are the events of an earlier --checkpoint run that waited, merged in
+# front of the new ones. With hold the events a server that is behind may
+# still precede wait in turn (see split_settled) and are returned.
+def _add_merged(reports, extractors, group_results, held=None, hold=False):
+    label = " + ".join(file_path for file_path, _ in group_results)
+    all_streams = []
+    for i in range(len(extractors)):
+        streams = [chain.from_iterable(results[i] for results in range_results) for _, range_results in group_results]
+        if held is not None:
+            streams = [chain(events, new_events) for events, new_events in zip(held["events"][i], streams)]
+        all_streams.append(streams)
+    waiting = None
+    if hold:
+        all_streams = [[list(events) for events in streams] for streams in all_streams]
+        reached = reached_times(list(zip(*all_streams)), held and held["reached"])
+        all_streams, events = zip(*(split_settled(streams, reached) for streams in all_streams))
+        waiting = {"events": list(events), "reached": reached}
+    for i, (report, extractor) in enumerate(zip(reports, extractors)):
+        streams = all_streams[i]
+        if extractor.key is None:
+            streams = [source_keyed(events, source) for source, events in enumerate(streams)]
+        events = merge_events(streams)
+        if extractor.summarize is not None:
+            report.add_file(label, [extractor.summarize(label, events)])
+        else:
+            report.add_file(label, [events])
+    return waiting
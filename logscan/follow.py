@@ -0,0 +1,75 @@
+import os
+import time
+
+from logscan.reader import READ_BUFFER_SIZE, complete_end, list_log_files
+
+# How often a followed log is polled for new lines, in seconds
+POLL_INTERVAL = 0.5
+
+
+# Log files of the folder that sort after file_path (the hourly
+# *_log_YYYY-MM-DD-HH.txt names sort chronologically)
+def _newer_files(file_path, log_folder, suffixes):
+    name = os.path.basename(file_path)
+    return [path for path in list_log_files(log_folder, suffixes) if os.path.basename(path) > name]
+
+
+def _decode(raw_line):
+    return raw_line.decode('utf-8', errors='ignore')
+
+
+# Yield the complete lines appended to file_path from `start` on, polling for
+# more, until a newer log file shows up and this one has been read to the end.
+# With idle_ticks a None is yielded after every poll that found nothing, so
+# callers can do time based work (flushing, ...) while the log is quiet.
+def _follow_file(file_path, start, log_folder, suffixes, poll_interval, idle_ticks):
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        pending = b""  # Half-written last line, completed by a later read
+        while True:
+            chunk = file.read(READ_BUFFER_SIZE)
+            if chunk:
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                for raw_line in lines:
+                    yield _decode(raw_line + b"\n")
+                continue
+
+            if _newer_files(file_path, log_folder, suffixes):
+                # Rotated: pick up the last writes, then move on to the next file
+                lines = (pending + file.read()).split(b"\n")
+                pending = lines.pop()
+                for raw_line in lines:
+                    yield _decode(raw_line + b"\n")
+                if pending:
+                    yield _decode(pending)
+                return
+
+            if os.path.getsize(file_path) < file.tell():
+                # Truncated in place: start over from the top
+                file.seek(0)
+                pending = b""
+                continue
+
+            if idle_ticks:
+                yield None
+            time.sleep(poll_interval)
+
+
+# Follow the newest log file of a folder like `tail -F`, moving on to the next
+# hourly file when the log rotates. Yields (file_path, lines) for each file in
+# turn; `lines` yields complete lines as they are written and ends once the
+# file has rotated, so it has to be consumed before asking for the next file.
+# Without from_start the first file is only read from its current end.
+def follow_files(log_folder, suffixes=(".txt",), from_start=False, poll_interval=POLL_INTERVAL, idle_ticks=False):
+    log_files = list_log_files(log_folder, suffixes)
+    while not log_files:
+        time.sleep(poll_interval)
+        log_files = list_log_files(log_folder, suffixes)
+
+    file_path = log_files[-1]
+    start = 0 if from_start else complete_end(file_path)
+    while True:
+        yield file_path, _follow_file(file_path, start, log_folder, suffixes, poll_interval, idle_ticks)
+        file_path = _newer_files(file_path, log_folder, suffixes)[0]
+        start = 0
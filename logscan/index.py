@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+HOUR_MS = 3600 * 1000
+
+# Query results kept by a TransactionIndex (least recently used dropped first)
+CACHE_SIZE = 256
+
+
+def _add(index, value, position):
+    if value is None or value == "":
+        return
+    positions = index.get(value)
+    if positions is None:
+        index[value] = [position]
+    else:
+        positions.append(position)
+
+
+# The report rows of one log file with their lookups: positions of the rows
+# by terminal (DeviceSerialNumber), RRNumber, TxnType and hour of TrxStart
+class FileIndex:
+    def __init__(self, rows):
+        self.rows = rows
+        self.by_terminal = {}
+        self.by_rrn = {}
+        self.by_txn_type = {}
+        self.by_hour = {}
+        for position, row in enumerate(rows):
+            _add(self.by_terminal, row.get("DeviceSerialNumber"), position)
+            _add(self.by_rrn, row.get("RRNumber"), position)
+            _add(self.by_txn_type, row.get("TxnType"), position)
+            start = row.get("TrxStart")
+            if isinstance(start, int):
+                _add(self.by_hour, start // HOUR_MS, position)
+
+    # Positions of the rows that may match, from the narrowest lookup that
+    # applies (every row when none does)
+    def candidates(self, terminal, rrn, txn_type, from_ms, to_ms):
+        best = None
+        for index, value in ((self.by_terminal, terminal), (self.by_rrn, rrn), (self.by_txn_type, txn_type)):
+            if value is not None:
+                positions = index.get(value, ())
+                if best is None or len(positions) < len(best):
+                    best = positions
+        if best is not None:
+            return best
+        if from_ms is not None or to_ms is not None:
+            first = from_ms // HOUR_MS if from_ms is not None else None
+            last = (to_ms - 1) // HOUR_MS if to_ms is not None else None
+            positions = []
+            for hour, hour_positions in self.by_hour.items():
+                if (first is None or hour >= first) and (last is None or hour <= last):
+                    positions.extend(hour_positions)
+            return sorted(positions)
+        return range(len(self.rows))
+
+
+def _matches(row, terminal, rrn, txn_type, from_ms, to_ms, min_total_ms):
+    if terminal is not None and row.get("DeviceSerialNumber") != terminal:
+        return False
+    if rrn is not None and row.get("RRNumber") != rrn:
+        return False
+    if txn_type is not None and row.get("TxnType") != txn_type:
+        return False
+    if from_ms is not None or to_ms is not None:
+        start = row.get("TrxStart")
+        if not isinstance(start, int):
+            return False
+        if (from_ms is not None and start < from_ms) or (to_ms is not None and start >= to_ms):
+            return False
+    if min_total_ms is not None:
+        total = row.get("TotalTime")
+        if not isinstance(total, int) or total < min_total_ms:
+            return False
+    return True
+
+
+# Parsed transaction rows of every log file, held in memory with their
+# lookups so questions like "terminal X yesterday" or "Refunds over 5 s" are
+# answered without reading the logs again. Files are replaced as a whole when
+# they change; the answers of recent queries are cached until then. Safe to
+# query from several threads while files are being replaced.
+class TransactionIndex:
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.files = {}  # log file path -> FileIndex
+        self.generation = 0  # Bumped whenever files change
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # query -> (total, rows)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+    # Put in the rows of changed files (path -> FileIndex) and drop the
+    # removed ones
+    def replace_files(self, file_indexes, removed=()):
+        with self.lock:
+            files = dict(self.files)
+            files.update(file_indexes)
+            for file_path in removed:
+                files.pop(file_path, None)
+            self.files = files
+            self.generation += 1
+            self.cache.clear()
+
+    def row_count(self):
+        return sum(len(file_index.rows) for file_index in self.files.values())
+
+    # (number of matching rows, the first `limit` of them in log order).
+    # Times are epoch ms; from_ms / to_ms select on TrxStart, min_total_ms
+    # on TotalTime.
+    def query(self, terminal=None, rrn=None, txn_type=None, from_ms=None, to_ms=None, min_total_ms=None, limit=None):
+        key = (terminal, rrn, txn_type, from_ms, to_ms, min_total_ms, limit)
+        with self.lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+            files, generation = self.files, self.generation
+
+        total, rows = 0, []
+        for file_path in sorted(files):
+            file_index = files[file_path]
+            for position in file_index.candidates(terminal, rrn, txn_type, from_ms, to_ms):
+                row = file_index.rows[position]
+                if _matches(row, terminal, rrn, txn_type, from_ms, to_ms, min_total_ms):
+                    total += 1
+                    if limit is None or len(rows) < limit:
+                        rows.append(row)
+        result = (total, rows)
+
+        with self.lock:
+            if self.generation == generation:  # Files didn't change meanwhile
+                self.cache[key] = result
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return result
@@ -0,0 +1,125 @@
+import re
+
+# Logger names that emit every marker the transaction scripts look for.
+# Lines from any other logger (JWT tokens, background reconnects, DB grains ...)
+# are rejected with a plain substring check before any regex runs.
+TRANSACTION_LOGGERS = (
+    "TransactionController -",
+    "FuturexGrain -",
+    "MessagePackingGrain -",
+    "ConnectionFileAppender -",
+)
+
+_REGEX_SPECIAL = set(".^$*+?{}[]|()")
+_QUANTIFIERS = set("*+?{")
+
+
+# Literal text every match of `pattern` has to start with, e.g.
+# '"rrNumber":"([^"]+)"' -> '"rrNumber":"'. Empty when the pattern starts with
+# a class, group or anything else that is not plain text.
+def literal_prefix(pattern):
+    source = pattern.pattern if hasattr(pattern, "pattern") else pattern
+    prefix = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            if i + 1 >= len(source) or source[i + 1].isalnum():
+                break  # \d, \w, \b ... are not literals
+            char = source[i + 1]
+            step = 2
+        elif char in _REGEX_SPECIAL:
+            break
+        else:
+            step = 1
+        # A quantified character is optional/repeated, so it can't be relied on
+        if i + step < len(source) and source[i + step] in _QUANTIFIERS:
+            break
+        prefix.append(char)
+        i += step
+    return "".join(prefix)
+
+
+# Bytes version of a str pattern, for matching undecoded lines
+def encode_pattern(pattern):
+    return re.compile(pattern.pattern.encode("utf-8"), pattern.flags & ~re.UNICODE)
+
+
+# Matches one log line against every field pattern in a single pass.
+#
+# `patterns` is the same field -> compiled regex dict the scripts already keep.
+# The literal prefix of every pattern goes into one alternation of plain
+# strings, so a line is scanned once no matter how many fields there are; only
+# the fields whose literal turns up are confirmed with their own regex.
+# match() returns a dict of field -> match object holding the first hit of
+# every field present on the line.
+#
+# With binary=True the same patterns are compiled for raw bytes lines, so the
+# bytes engine can match without decoding; captured groups are then bytes too.
+class LineMatcher:
+    def __init__(self, patterns, prefilter=TRANSACTION_LOGGERS, binary=False):
+        self.patterns = {}
+        self.prefilter = tuple(prefilter or ())
+        if binary:
+            self.prefilter = tuple(literal.encode("utf-8") for literal in self.prefilter)
+
+        literals = {}  # literal -> fields starting with it
+        self.unanchored = []  # fields with no literal prefix, searched directly
+        for field, pattern in patterns.items():
+            literal = literal_prefix(pattern)
+            if binary:
+                pattern = encode_pattern(pattern)
+                literal = literal.encode("utf-8")
+            self.patterns[field] = pattern
+            if literal:
+                literals.setdefault(literal, []).append(field)
+            else:
+                self.unanchored.append(field)
+
+        # Longest literal first so that, when one literal is a prefix of
+        # another, the longer one wins and the shorter one's fields still run
+        ordered = sorted(literals, key=len, reverse=True)
+        self.literal_fields = {}
+        for literal in ordered:
+            self.literal_fields[literal] = [
+                field
+                for other in ordered if literal.startswith(other)
+                for field in literals[other]
+            ]
+        # Literals a line must contain to hit anything, or None when some field
+        # has no literal prefix and every line has to be looked at
+        self.literals = None if self.unanchored else ordered
+        separator = b"|" if binary else "|"
+        self.combined = re.compile(separator.join(re.escape(literal) for literal in ordered)) if ordered else None
+
+    # Cheap literal check that lets most lines skip the regex entirely
+    def accepts(self, line):
+        if not self.prefilter:
+            return True
+        for literal in self.prefilter:
+            if literal in line:
+                return True
+        return False
+
+    def match(self, line):
+        if not self.accepts(line):
+            return {}
+
+        hits = {}
+        if self.combined is not None:
+            m = self.combined.search(line)
+            while m:
+                start = m.start()
+                for field in self.literal_fields[m.group()]:
+                    if field not in hits:
+                        field_match = self.patterns[field].match(line, start)
+                        if field_match:
+                            hits[field] = field_match
+                # Restart one character on so overlapping literals are not lost
+                m = self.combined.search(line, start + 1)
+
+        for field in self.unanchored:
+            field_match = self.patterns[field].search(line)
+            if field_match:
+                hits[field] = field_match
+        return hits
@@ -0,0 +1,79 @@
+import heapq
+import os
+from operator import itemgetter
+
+from logscan.reader import list_log_files
+from logscan.window import file_hour_ms
+
+
+# Log files of several app servers' folders (ProdAPP01 ... ProdAPP08) grouped
+# by the hour their name carries, hours in order and each group in the order
+# of the folders. Files whose name has no hour make a group of their own name.
+def hour_groups(log_folders):
+    groups = {}
+    for log_folder in log_folders:
+        for file_path in list_log_files(log_folder):
+            hour_ms = file_hour_ms(file_path)
+            key = (0, hour_ms, "") if hour_ms is not None else (1, 0, os.path.basename(file_path))
+            groups.setdefault(key, []).append(file_path)
+    return [groups[key] for key in sorted(groups)]
+
+
+def _keyed(events):
+    last_ms = -1
+    for event in events:
+        if event[2] is not None:
+            last_ms = event[2]
+        yield last_ms, event
+
+
+# The events of one server's stream keyed by the server (its position in
+# --sources), for extractors without a key of their own: the reports then
+# keep the transaction of each server apart instead of mixing their lines
+def source_keyed(events, source):
+    for _, values, ms in events:
+        yield source, values, ms
+
+
+# One stream of the events of several time-ordered streams (one per server),
+# ordered by log time: a heap-based k-way merge holding one event per stream.
+# Events without a time stay right after the one before them; equal times
+# keep the order of the streams, so the result is repeatable.
+def merge_events(streams):
+    for _, event in heapq.merge(*(_keyed(events) for events in streams), key=itemgetter(0)):
+        yield event
+
+
+
+# The latest time each of several time-ordered streams (one per server) has
+# reached: `sources` holds the event lists of every extractor on each server,
+# `reached` the times reached before (None at first)
+def reached_times(sources, reached=None):
+    reached = list(reached or [-1] * len(sources))
+    for source, event_lists in enumerate(sources):
+        for events in event_lists:
+            for _, _, ms in reversed(events):
+                if ms is not None:
+                    reached[source] = max(reached[source], ms)
+                    break
+    return reached
+
+
+# Split the event lists of several time-ordered streams (one per server) at
+# the latest time all of them have reached, for a --checkpoint run that stops
+# while their files still grow: a server that is behind may still log lines
+# before the other servers' newer ones, so those wait for the next run.
+# Returns the streams up to that time and the events that wait.
+def split_settled(streams, reached):
+    settle_ms = min(reached, default=-1)
+    settled, waiting = [], []
+    for events in streams:
+        cut = len(events)
+        # Events without a time go with the one before them
+        while cut and (events[cut - 1][2] is None or events[cut - 1][2] >= settle_ms):
+            cut -= 1
+        while cut < len(events) and events[cut][2] is None:
+            cut += 1
+        settled.append(events[:cut])
+        waiting.append(events[cut:])
+    return settled, waiting
@@ -0,0 +1,146 @@
+import csv
+import json
+import os
+import sys
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from logscan.columnar import ArrowSink, ParquetSink
+from logscan.timestamps import display_value
+
+# File extension of each report format
+FORMAT_EXTENSIONS = {
+    "xlsx": ".xlsx",
+    "csv": ".csv",
+    "jsonl": ".jsonl",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+
+def _open_stream(output_path, append=False):
+    if output_path in (None, "-"):
+        return sys.stdout
+    return open(output_path, 'a' if append else 'w', encoding='utf-8', newline='')
+
+
+# Rows of an Excel sheet at most, header included
+EXCEL_MAX_ROWS = 1048576
+
+
+# Writes rows to an xlsx sheet with openpyxl's write-only mode: each row is
+# serialized as it is appended instead of living on as cell objects until save.
+# Like the csv and jsonl sinks it writes int ms times and durations as text.
+# Rows past what Excel opens in one sheet go on in "<title> (2)", "(3)" ...
+class XlsxSink:
+    def __init__(self, output_path, columns, sheet_title="Transaction Data", bold_header=False):
+        self.path = output_path
+        self.columns = columns
+        self.sheet_title = sheet_title
+        self.bold_header = bold_header
+        self.wb = Workbook(write_only=True)
+        self.ws = self.add_sheet(sheet_title)
+        self.sheet_rows = 0
+        self.sheet_count = 1
+
+    # A new sheet holding the header row (columns, by default the sink's)
+    def add_sheet(self, title, columns=None):
+        ws = self.wb.create_sheet(title)
+        header = []
+        for col in columns or self.columns:
+            cell = WriteOnlyCell(ws, value=col)
+            if self.bold_header:
+                cell.font = Font(bold=True)  # Set the font to bold
+            header.append(cell)
+        ws.append(header)
+        return ws
+
+    def write(self, row):
+        if self.sheet_rows == EXCEL_MAX_ROWS - 1:
+            self.sheet_count += 1
+            self.ws = self.add_sheet(f"{self.sheet_title[:24]} ({self.sheet_count})")  # Titles are 31 characters at most
+            self.sheet_rows = 0
+        self.append(self.ws, row)
+        self.sheet_rows += 1
+
+    # Write a row to a sheet of add_sheet
+    def append(self, ws, row, columns=None):
+        ws.append([display_value(col, row.get(col, "")) for col in columns or self.columns])
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+# Writes rows as CSV, one line per row as soon as it is produced. With flush
+# (--follow) or on stdout every row is flushed as it is written, so a reader
+# sees it at once; a report file is left to the stream's buffering. With
+# append (--checkpoint reruns) rows go on at the end of an existing file,
+# under its header.
+class CsvSink:
+    def __init__(self, output_path, columns, sheet_title=None, bold_header=False, flush=False, append=False):
+        self.path = output_path
+        self.columns = columns
+        self.stream = _open_stream(output_path, append)
+        self.flush = flush or self.stream is sys.stdout
+        self.writer = csv.writer(self.stream)
+        if self.stream is sys.stdout or not self.stream.tell():
+            self.writer.writerow(columns)
+        if self.flush:
+            self.stream.flush()
+
+    def write(self, row):
+        self.writer.writerow([display_value(col, row.get(col, "")) for col in self.columns])
+        if self.flush:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+# Writes rows as JSON lines (one object per line) as soon as they are
+# produced, flushed and appended like CsvSink's
+class JsonLinesSink:
+    def __init__(self, output_path, columns, sheet_title=None, bold_header=False, flush=False, append=False):
+        self.path = output_path
+        self.stream = _open_stream(output_path, append)
+        self.flush = flush or self.stream is sys.stdout
+        self.columns = columns
+
+    def write(self, row):
+        self.stream.write(json.dumps({col: display_value(col, row.get(col, "")) for col in self.columns}, default=str) + "\n")
+        if self.flush:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+SINKS = {
+    "xlsx": XlsxSink,
+    "csv": CsvSink,
+    "jsonl": JsonLinesSink,
+    "parquet": ParquetSink,
+    "arrow": ArrowSink,
+}
+
+
+# Formats whose sinks can append to an existing report
+APPENDABLE_FORMATS = ("csv", "jsonl")
+
+
+# Open a row sink of the given format. csv and jsonl go to stdout when
+# output_path is None or "-", and with append go on at the end of the file.
+def open_sink(output_format, output_path, columns, sheet_title="Transaction Data", bold_header=False, append=False):
+    if append:
+        return SINKS[output_format](output_path, columns, sheet_title, bold_header, append=True)
+    return SINKS[output_format](output_path, columns, sheet_title, bold_header)
+
+
+# default_path with the extension of output_format
+def report_path(default_path, output_format):
+    root, _ = os.path.splitext(default_path)
+    return root + FORMAT_EXTENSIONS[output_format]
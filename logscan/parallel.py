@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from logscan.reader import CHUNK_SIZE, split_file
+
+
+# Resolve the --workers value: 0 means one worker per CPU
+def resolve_workers(workers):
+    if workers is None or workers < 0:
+        return 1
+    if workers == 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+# Run func over every file path, in a process pool when more than one worker
+# is asked for. Big files are split into newline-aligned byte ranges so one
+# large (peak hour) file is spread over every worker instead of keeping a
+# single one busy. func(file_path, start, end) scans one range. Yields
+# (file_path, [result of each range in file order]) in the order of
+# file_paths whatever the worker count, so callers merge them deterministically.
+#
+# With a CheckpointStore only the bytes appended since the last run are
+# scanned, and with a ScanCache the cached results of a file come first in
+# its list; either is updated (the caller saves it). What to scan is worked
+# out (resume() called for every file) before this returns. With a TimeWindow
+# only the byte range of each file holding the window is scanned.
+def map_file_ranges(func, file_paths, workers=1, chunk_size=CHUNK_SIZE, checkpoints=None, window=None):
+    workers = resolve_workers(workers)
+
+    plans = []  # (file_path, scanned up to, earlier results, ranges to scan)
+    for file_path in file_paths:
+        if checkpoints is not None:
+            start, end, previous = checkpoints.resume(file_path)
+        elif window is not None:
+            (start, end), previous = window.byte_range(file_path), []
+        else:
+            start, end, previous = 0, None, []
+
+        if end is not None and start >= end:
+            ranges = []  # Nothing new since the last run
+        elif workers <= 1:
+            ranges = [(start, end)]
+        else:
+            ranges = split_file(file_path, chunk_size, start, end)
+        plans.append((file_path, end, previous, ranges))
+    return _scan_plans(func, plans, workers, checkpoints)
+
+
+def _scan_plans(func, plans, workers, checkpoints):
+    tasks = [(file_path, start, end) for file_path, _, _, ranges in plans for start, end in ranges]
+    if workers <= 1 or len(tasks) <= 1:
+        results = (func(*task) for task in tasks)
+        yield from _collect_ranges(plans, results, checkpoints)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        yield from _collect_ranges(plans, pool.map(func, *zip(*tasks)), checkpoints)
+
+
+# Regroup the flat, ordered range results of map_file_ranges per file
+def _collect_ranges(plans, results, checkpoints):
+    results = iter(results)
+    for file_path, end, previous, ranges in plans:
+        file_results = list(previous)
+        for _ in ranges:
+            file_results.append(next(results))
+        if checkpoints is not None:
+            checkpoints.update(file_path, end, file_results)
+        yield file_path, file_results
@@ -0,0 +1,298 @@
+import bz2
+import gzip
+import io
+import mmap
+import os
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst logs
+    zstandard = None
+
+# Size of each raw read from disk. Large reads keep syscalls down on multi-GB
+# logs while memory stays bounded by this buffer, not by the file size.
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+
+# Size of the byte ranges a single file is split into for parallel scanning
+CHUNK_SIZE = 32 * 1024 * 1024
+
+# Rotated logs the shipper has compressed. They are decompressed as a stream
+# while being scanned, never to disk, and always read whole: offsets (ranges,
+# checkpoints) of a compressed file are of its compressed bytes.
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".zst")
+
+# Log file names picked up from the log folder
+LOG_SUFFIXES = (".txt",) + COMPRESSED_SUFFIXES
+
+# Decompressed blocks of READ_BUFFER_SIZE a decompression thread may get ahead
+# of the scan
+DECOMPRESS_AHEAD = 4
+
+
+def is_compressed(file_path):
+    return file_path.endswith(COMPRESSED_SUFFIXES)
+
+
+def _open_decompressing(file_path):
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, 'rb')
+    if file_path.endswith(".bz2"):
+        return bz2.open(file_path, 'rb')
+    if zstandard is None:
+        raise SystemExit(".zst logs need zstandard: pip install zstandard")
+    return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+
+
+# Raw stream of the decompressed bytes of a compressed log. A thread of its own
+# decompresses up to DECOMPRESS_AHEAD blocks ahead (zlib, bz2 and zstd release
+# the GIL while they work), so decompression overlaps with the scan instead of
+# adding to it.
+class _DecompressedStream(io.RawIOBase):
+    def __init__(self, file_path, block_size=READ_BUFFER_SIZE):
+        self.blocks = queue.Queue(DECOMPRESS_AHEAD)
+        self.block = b""
+        self.pos = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._decompress, args=(file_path, block_size), daemon=True)
+        self.thread.start()
+
+    def _decompress(self, file_path, block_size):
+        try:
+            with _open_decompressing(file_path) as source:
+                while not self.stopped.is_set():
+                    block = source.read(block_size)
+                    self._put(block)
+                    if not block:
+                        return
+        except BaseException as error:  # Raised again in the reading thread
+            self._put(error)
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.block is None:
+            return 0  # Decompressed to the end
+        if self.pos >= len(self.block):
+            block = self.blocks.get()
+            if isinstance(block, BaseException):
+                raise block
+            if not block:
+                self.block = None
+                return 0
+            self.block, self.pos = block, 0
+        size = min(len(buffer), len(self.block) - self.pos)
+        buffer[:size] = self.block[self.pos:self.pos + size]
+        self.pos += size
+        return size
+
+    def close(self):
+        self.stopped.set()  # The thread stops at its next block
+        super().close()
+
+
+# Buffered binary stream of the decompressed content of a compressed log
+def open_decompressed(file_path, buffer_size=READ_BUFFER_SIZE):
+    return io.BufferedReader(_DecompressedStream(file_path), buffer_size)
+
+
+def _check_whole(file_path, start):
+    if start:
+        raise ValueError(f"{file_path} is compressed and can only be read from its start")
+
+
+# Read-only raw stream over one byte range of a memory-mapped file
+class _MappedRange(io.RawIOBase):
+    def __init__(self, mapped, start, end):
+        self.mapped = mapped
+        self.pos = start
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.end - self.pos)
+        buffer[:size] = self.mapped[self.pos:self.pos + size]
+        self.pos += size
+        return size
+
+
+# Yield the lines of a log file one at a time (instead of file.readlines()).
+# With `end` set only the bytes in [start, end) are read, through an mmap, so
+# several processes can each take their own slice of one big file.
+def iter_lines(file_path, start=0, end=None, buffer_size=READ_BUFFER_SIZE):
+    if is_compressed(file_path):
+        _check_whole(file_path, start)
+        with io.TextIOWrapper(open_decompressed(file_path, buffer_size), encoding='utf-8', errors='ignore') as file:
+            for line in file:
+                yield line
+        return
+
+    if end is None:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore', buffering=buffer_size) as file:  # Use 'ignore' to skip errors
+            for line in file:
+                yield line
+        return
+
+    if start >= end:
+        return
+    with open(file_path, 'rb') as raw_file:
+        with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            raw = _MappedRange(mapped, start, end)
+            # Same decoding and newline handling as the plain open() above
+            with io.TextIOWrapper(io.BufferedReader(raw, buffer_size), encoding='utf-8', errors='ignore') as file:
+                for line in file:
+                    yield line
+
+
+# Yield the raw lines of a log file (or of [start, end)) as bytes, straight
+# from an mmap of the file with no UTF-8 decoding. Used by the bytes engine.
+def iter_byte_lines(file_path, start=0, end=None):
+    if is_compressed(file_path):
+        _check_whole(file_path, start)
+        with open_decompressed(file_path) as file:
+            for line in file:
+                yield line
+        return
+
+    with open(file_path, 'rb') as raw_file:
+        size = os.fstat(raw_file.fileno()).st_size
+        if end is None or end > size:
+            end = size
+        if start >= end:
+            return
+        with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            mapped.seek(start)
+            readline = mapped.readline
+            pos = start
+            while pos < end:
+                line = readline()
+                pos += len(line)
+                yield line
+
+
+# Like iter_byte_lines, but only yields the lines that contain one of
+# `literals`. Each literal is looked for with mmap.find over the raw buffer, a
+# window at a time, so the lines in between are never split out or touched
+# from Python at all. Lines come out in file order, each once. Compressed logs
+# are searched the same way, a decompressed block at a time.
+def iter_byte_lines_containing(file_path, literals, start=0, end=None, window_size=READ_BUFFER_SIZE):
+    literals = set(literals)
+    if is_compressed(file_path):
+        _check_whole(file_path, start)
+        with open_decompressed(file_path) as file:
+            pending = b""  # Lines cut by the end of the last block
+            while True:
+                block = file.read(window_size)
+                buffer = pending + block
+                if not block:
+                    yield from _lines_containing(buffer, literals, 0, len(buffer))
+                    return
+                window_end = buffer.rfind(b"\n") + 1
+                yield from _lines_containing(buffer, literals, 0, window_end)
+                pending = buffer[window_end:]
+
+    with open(file_path, 'rb') as raw_file:
+        size = os.fstat(raw_file.fileno()).st_size
+        if end is None or end > size:
+            end = size
+        if start >= end:
+            return
+        with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            window_start = start
+            while window_start < end:
+                # Windows end after a newline; literals never span lines, so
+                # every occurrence falls entirely inside one window
+                window_end = min(window_start + window_size, end)
+                if window_end < end:
+                    newline = mapped.find(b"\n", window_end - 1, end)
+                    window_end = end if newline == -1 else newline + 1
+                yield from _lines_containing(mapped, literals, window_start, window_end)
+                window_start = window_end
+
+
+# Lines of buffer[window_start:window_end] (an mmap or bytes, whole lines
+# only) that contain one of `literals`, in order
+def _lines_containing(buffer, literals, window_start, window_end):
+    line_starts = set()
+    for literal in literals:
+        found = buffer.find(literal, window_start, window_end)
+        while found != -1:
+            newline = buffer.rfind(b"\n", window_start, found)
+            line_starts.add(window_start if newline == -1 else newline + 1)
+            found = buffer.find(literal, found + 1, window_end)
+
+    for line_start in sorted(line_starts):
+        line_end = buffer.find(b"\n", line_start, window_end)
+        yield buffer[line_start:window_end if line_end == -1 else line_end + 1]
+
+
+# Decode a value captured by the bytes engine; str values pass through
+def to_text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='ignore')
+    return value
+
+
+# Split a file (or its bytes [start, end)) into byte ranges of about
+# chunk_size, each ending right after a newline so no line is cut in two.
+# A compressed file is one range.
+def split_file(file_path, chunk_size=CHUNK_SIZE, start=0, end=None):
+    if end is None:
+        end = os.path.getsize(file_path)
+    if start >= end:
+        return []
+    if end - start <= chunk_size or is_compressed(file_path):
+        return [(start, end)]
+
+    ranges = []
+    with open(file_path, 'rb') as raw_file:
+        with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            while start < end:
+                range_end = start + chunk_size
+                if range_end >= end:
+                    range_end = end
+                else:
+                    newline = mapped.find(b"\n", range_end - 1, end)
+                    range_end = end if newline == -1 else newline + 1
+                ranges.append((start, range_end))
+                start = range_end
+    return ranges
+
+
+# Offset just past the last complete line of a file. A log that is still being
+# written may end in a half-written line, which must not be scanned yet.
+def complete_end(file_path, block_size=64 * 1024):
+    if is_compressed(file_path):
+        return os.path.getsize(file_path)  # Only rotated, finished logs get compressed
+    with open(file_path, 'rb') as raw_file:
+        pos = raw_file.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(block_size, pos)
+            raw_file.seek(pos - step)
+            newline = raw_file.read(step).rfind(b"\n")
+            if newline != -1:
+                return pos - step + newline + 1
+            pos -= step
+    return 0
+
+
+# Log files of a folder in a stable (name) order, so reports don't depend on
+# the order os.listdir happens to return
+def list_log_files(log_folder, suffixes=LOG_SUFFIXES):
+    file_paths = []
+    for file_name in sorted(os.listdir(log_folder)):
+        if file_name.endswith(suffixes):
+            file_paths.append(os.path.join(log_folder, file_name))
+    return file_paths
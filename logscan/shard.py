@@ -0,0 +1,237 @@
+import os
+import pickle
+import re
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from logscan.output import EXCEL_MAX_ROWS, XlsxSink, open_sink
+from logscan.parallel import resolve_workers
+
+# How a report can be split (--shard-by) and what the shards become (--shard-into)
+SHARD_BY = ("rows", "terminal", "day")
+SHARD_INTO = ("workbooks", "sheets")
+
+# Rows of one shard at most by default: what an Excel sheet holds under its header
+SHARD_ROWS = EXCEL_MAX_ROWS - 1
+
+# Columns the terminal and day shards are keyed on; the first one a report has
+KEY_COLUMNS = {
+    "terminal": ("DeviceSerialNumber",),
+    "day": ("TrxStart", "ResponseTime"),
+}
+
+# Rows of a shard gathered before they are appended to its spill file, and
+# rows of all shards held at most before every shard's are
+SPILL_ROWS = 1000
+MAX_HELD_ROWS = 100000
+
+# Columns of the index sheet / manifest
+INDEX_COLUMNS = ["Shard", "File", "Sheet", "Rows"]
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+# Shard key of a day column value: the UTC date of an int ms time, or the date
+# part of a "YYYY-MM-DD HH:MM:SS" text
+def _day(value):
+    if isinstance(value, int):
+        return datetime.fromtimestamp(value / 1000, timezone.utc).strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+# Sheet titles are 31 characters at most
+SHEET_TITLE_LENGTH = 31
+
+# Shard file writes queued per worker at most; past that the oldest is
+# waited for, so finished shards don't pile up
+PENDING_PER_WORKER = 2
+
+
+# Name of a shard, safe in file names and sheet titles. Different keys can
+# give the same name ("a/b" and "a_b"); ShardedSink makes them unique.
+def shard_label(key, part):
+    if key is None:
+        return f"{part:03d}"
+    key = _UNSAFE.sub("_", str(key)).strip("_") or "none"
+    return key if part == 1 else f"{key}_{part}"
+
+
+def _with_label(path, label):
+    root, extension = os.path.splitext(path)
+    return f"{root}_{label}{extension}"
+
+
+# Write the rows spilled to spill_path (pickled lists of rows) as one shard
+# file, then drop the spill; runs in a worker process
+def write_shard(output_format, output_path, columns, sheet_title, bold_header, spill_path):
+    sink = open_sink(output_format, output_path, columns, sheet_title, bold_header)
+    count = 0
+    with open(spill_path, 'rb') as spill:
+        while True:
+            try:
+                rows = pickle.load(spill)
+            except EOFError:
+                break
+            for row in rows:
+                sink.write(row)
+            count += len(rows)
+    sink.close()
+    os.remove(spill_path)
+    return count
+
+
+# Row sink splitting a report into shards of at most shard_rows rows, one run
+# of rows per terminal or per day, or both:
+#   - into "workbooks": each shard is a file of its own next to output_path
+#     (<name>_001.xlsx, <name>_20049907.xlsx, <name>_2025-01-07.xlsx ...).
+#     Rows are appended in batches to a spill file per shard (in a temporary
+#     folder next to output_path) as they come, so only a few are held in
+#     memory however many shards are open. Once a shard is complete (full, or
+#     at the end of the run for terminal and day shards) `workers` processes
+#     turn its spill into the shard file. <name>_index.xlsx (csv for the other
+#     formats) lists every shard with its row count. At most
+#     PENDING_PER_WORKER shard files per worker wait to be written.
+#   - into "sheets": one xlsx workbook at output_path with a sheet per shard,
+#     written as the rows come, after an "Index" sheet listing them.
+class ShardedSink:
+    def __init__(self, output_format, output_path, columns, sheet_title="Transaction Data", bold_header=False,
+                 shard_by="rows", shard_into="workbooks", shard_rows=SHARD_ROWS, workers=1):
+        if output_path in (None, "-"):
+            raise SystemExit("A sharded report is written to files; give --output a file path")
+        if shard_into == "sheets" and output_format != "xlsx":
+            raise SystemExit("--shard-into sheets needs --format xlsx")
+        self.key_column = None
+        if shard_by != "rows":
+            key_columns = [col for col in KEY_COLUMNS[shard_by] if col in columns]
+            if not key_columns:
+                raise SystemExit(f"This report has no column to shard by {shard_by}")
+            self.key_column = key_columns[0]
+        self.key_of = _day if shard_by == "day" else str
+
+        self.output_format = output_format
+        self.output_path = output_path
+        self.columns = columns
+        self.sheet_title = sheet_title
+        self.bold_header = bold_header
+        self.shard_rows = max(shard_rows, 1)
+        if output_format == "xlsx":
+            self.shard_rows = min(self.shard_rows, SHARD_ROWS)
+        self.shards = {}  # key -> shard being filled (see _new_shard)
+        # Labels given so far, lower case as file systems and Excel ignore case;
+        # "index" names the index file / sheet
+        self.labels = {"index"}
+        self.index = []  # Rows of the index, shards in the order they were completed
+
+        self.workbook = None
+        self.spill_folder = None
+        self.held_rows = 0
+        self.pool = None
+        self.pending = deque()
+        if shard_into == "sheets":
+            self.workbook = XlsxSink(output_path, INDEX_COLUMNS, "Index", bold_header)
+            self.path = output_path
+        else:
+            index_format = "xlsx" if output_format == "xlsx" else "csv"
+            self.path = _with_label(os.path.splitext(output_path)[0] + "." + index_format, "index")
+            self.spill_folder = tempfile.mkdtemp(prefix=".shards_", dir=os.path.dirname(output_path) or ".")
+            workers = resolve_workers(workers)
+            if workers > 1:
+                self.pool = ProcessPoolExecutor(max_workers=workers)
+            self.max_pending = PENDING_PER_WORKER * workers
+
+    def write(self, row):
+        key = None
+        if self.key_column is not None:
+            value = row.get(self.key_column)
+            key = self.key_of(value) if value not in (None, "") else "none"
+        shard = self.shards.get(key)
+        if shard is None:
+            shard = self.shards[key] = self._new_shard(key, 1)
+        elif shard[2] == self.shard_rows:
+            self._complete(shard)
+            shard = self.shards[key] = self._new_shard(key, shard[0] + 1)
+
+        shard[2] += 1
+        if self.workbook is not None:
+            self.workbook.append(shard[1], row, self.columns)
+            return
+        shard[1].append(row)
+        self.held_rows += 1
+        if len(shard[1]) >= SPILL_ROWS:
+            self._spill(shard)
+        elif self.held_rows > MAX_HELD_ROWS:  # Many shards each holding a few rows
+            for open_shard in self.shards.values():
+                self._spill(open_shard)
+
+    # [part, sheet or rows not spilled yet, row count, spill file path, label]
+    def _new_shard(self, key, part):
+        if self.workbook is not None:
+            label = self._unique_label(key, part, SHEET_TITLE_LENGTH)
+            return [part, self.workbook.add_sheet(label, self.columns), 0, None, label]
+        label = self._unique_label(key, part)
+        return [part, [], 0, os.path.join(self.spill_folder, f"{label}.rows"), label]
+
+    # shard_label of a shard, cut to max_length and numbered -2, -3 ... when
+    # an earlier shard already has it
+    def _unique_label(self, key, part, max_length=None):
+        label = candidate = shard_label(key, part)
+        if max_length is not None:
+            candidate = label[-max_length:]
+        number = 1
+        while candidate.lower() in self.labels:
+            number += 1
+            suffix = f"-{number}"
+            candidate = (label if max_length is None else label[-(max_length - len(suffix)):]) + suffix
+        self.labels.add(candidate.lower())
+        return candidate
+
+    def _spill(self, shard):
+        if not shard[1]:
+            return
+        with open(shard[3], 'ab') as spill:
+            pickle.dump(shard[1], spill, protocol=pickle.HIGHEST_PROTOCOL)
+        self.held_rows -= len(shard[1])
+        shard[1] = []
+
+    def _complete(self, shard):
+        _, _, count, spill_path, label = shard
+        if self.workbook is not None:
+            self.index.append({"Shard": label, "File": os.path.basename(self.output_path), "Sheet": label, "Rows": count})
+            return
+
+        self._spill(shard)
+        output_path = _with_label(self.output_path, label)
+        self.index.append({"Shard": label, "File": os.path.basename(output_path), "Sheet": self.sheet_title, "Rows": count})
+        arguments = (self.output_format, output_path, self.columns, self.sheet_title, self.bold_header, spill_path)
+        if self.pool is None:
+            write_shard(*arguments)
+        else:
+            self.pending.append(self.pool.submit(write_shard, *arguments))
+            while len(self.pending) > self.max_pending:
+                self.pending.popleft().result()
+
+    def close(self):
+        try:
+            for key in sorted(self.shards, key=lambda key: (key is None, key or "")):
+                self._complete(self.shards[key])
+            self.shards = {}
+            while self.pending:
+                self.pending.popleft().result()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            if self.spill_folder is not None:
+                shutil.rmtree(self.spill_folder, ignore_errors=True)
+
+        if self.workbook is not None:
+            for index_row in self.index:
+                self.workbook.append(self.workbook.ws, index_row)
+            self.workbook.close()
+            return
+        index_sink = open_sink(os.path.splitext(self.path)[1][1:], self.path, INDEX_COLUMNS, "Index", self.bold_header)
+        for index_row in self.index:
+            index_sink.write(index_row)
+        index_sink.close()
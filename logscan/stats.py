@@ -0,0 +1,172 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Stats of the running process while --stats is on, None otherwise. Counting
+# is a no-op then, so the scripts can count unconditionally.
+_active = None
+
+# Stages in the order a run goes through them
+STAGES = ("read + match", "wait for scan", "build + write rows", "write report")
+
+# Lines of the cProfile / tracemalloc listings printed
+PROFILE_LINES = 25
+
+
+# Where the time of a run went and what it saw: wall and CPU time per stage,
+# counters per group (a report, or "scan"), and the bytes and scan time of
+# every file. Counts from worker processes come back as plain dicts and are
+# merged in with add_range.
+class Stats:
+    def __init__(self):
+        self.stages = {}  # stage -> [wall seconds, cpu seconds]
+        self.counters = Counter()  # (group, name) -> count
+        self.files = {}  # file path -> [bytes, scan seconds]
+        self.started = (time.perf_counter(), time.process_time())
+
+    def add_time(self, stage, wall, cpu):
+        times = self.stages.setdefault(stage, [0.0, 0.0])
+        times[0] += wall
+        times[1] += cpu
+
+    @contextmanager
+    def stage(self, stage):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - wall, time.process_time() - cpu)
+
+    # Merge what scan_range_stats measured for one range
+    def add_range(self, range_stats):
+        self.add_time("read + match", range_stats["wall"], range_stats["cpu"])
+        for (group, name), count in range_stats["counters"].items():
+            self.counters[group, name] += count
+        file_stats = self.files.setdefault(range_stats["file"], [0, 0.0])
+        file_stats[0] += range_stats["bytes"]
+        file_stats[1] += range_stats["wall"]
+
+    def to_dict(self):
+        total_wall = time.perf_counter() - self.started[0]
+        total_cpu = time.process_time() - self.started[1]
+        counters = {}
+        for (group, name), count in sorted(self.counters.items()):
+            counters.setdefault(group, {})[name] = count
+        return {
+            "stages": {
+                stage: {"wall": round(wall, 3), "cpu": round(cpu, 3)}
+                for stage, (wall, cpu) in sorted(self.stages.items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))
+            },
+            "total": {"wall": round(total_wall, 3), "cpu": round(total_cpu, 3)},
+            "counters": counters,
+            "files": [
+                {"path": path, "bytes": size, "seconds": round(seconds, 3),
+                 "mb_per_sec": round(size / (1024 * 1024) / seconds, 1) if seconds else None}
+                for path, (size, seconds) in self.files.items()
+            ],
+        }
+
+    def report(self, file=None):
+        stats = self.to_dict()
+        print("Stats (read + match is summed over the workers; write report is part of build + write rows)", file=file)
+        print(f"  {'stage':<24}{'wall s':>10}{'cpu s':>10}", file=file)
+        for stage, times in list(stats["stages"].items()) + [("total", stats["total"])]:
+            print(f"  {stage:<24}{times['wall']:>10.3f}{times['cpu']:>10.3f}", file=file)
+        for group, counters in stats["counters"].items():
+            print(f"  {group}:", file=file)
+            for name, count in counters.items():
+                print(f"    {name:<56}{count:>12}", file=file)
+        for file_stats in stats["files"]:
+            rate = f"{file_stats['mb_per_sec']} MB/s" if file_stats["mb_per_sec"] is not None else ""
+            print(f"  {file_stats['path']}: {file_stats['bytes'] / (1024 * 1024):.1f} MB in {file_stats['seconds']:.3f} s {rate}", file=file)
+
+    def dump(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+# Turn counting on for this process; the same Stats for every caller
+def enable():
+    global _active
+    if _active is None:
+        _active = Stats()
+    return _active
+
+
+def active():
+    return _active
+
+
+# Add n to counter `name` of `group` (a report name) when --stats is on
+def count(group, name, n=1):
+    if _active is not None and n:
+        _active.counters[group, name] += n
+
+
+# Time a block as `stage` when --stats is on
+def stage(name):
+    if _active is None:
+        return _nothing()
+    return _active.stage(name)
+
+
+@contextmanager
+def _nothing():
+    yield
+
+
+# Row sink that times its writes as the "write report" stage
+class TimedSink:
+    def __init__(self, sink, stats):
+        self.sink = sink
+        self.path = sink.path
+        self.stats = stats
+
+    def write(self, row):
+        wall, cpu = time.perf_counter(), time.process_time()
+        self.sink.write(row)
+        self.stats.add_time("write report", time.perf_counter() - wall, time.process_time() - cpu)
+
+    def close(self):
+        with self.stats.stage("write report"):
+            self.sink.close()
+
+
+# Run the block under cProfile (--profile FILE: raw stats to FILE and the top
+# functions by cumulative time printed) and/or tracemalloc (--tracemalloc: the
+# top allocation sites printed). Only the main process is profiled.
+@contextmanager
+def profiled(profile_path=None, trace_malloc=False):
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_malloc:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if trace_malloc:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        if profiler is not None:
+            profiler.dump_stats(profile_path)
+            listing = io.StringIO()
+            pstats.Stats(profiler, stream=listing).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            print(listing.getvalue())
+            print(f"Profile written to {profile_path}")
+        if trace_malloc:
+            print(f"Traced memory: {current / (1024 * 1024):.1f} MB now, {peak / (1024 * 1024):.1f} MB peak; top allocation sites:")
+            for statistic in snapshot.statistics("lineno")[:PROFILE_LINES]:
+                print(f"  {statistic}")
@@ -0,0 +1,147 @@
+from array import array
+
+from logscan.timestamps import TIME_COLUMNS
+
+try:
+    import numpy as np
+except ImportError:  # The durations are then worked out with plain loops
+    np = None
+
+# Rows held column-wise before their durations are computed and they are
+# written out
+STORE_BATCH = 64 * 1024
+
+# Duration columns: name -> (end stage, start stage) spans. The duration is the
+# first span minus the others, and only there when every stage of it is.
+DURATIONS = {
+    "TotalTime": [("TrxEnd", "TrxStart")],
+    "TotalTimeW/OSP": [("TrxEnd", "TrxStart"), ("ResponseFromSP", "RequestToSP")],
+    "CardDecryptionTime": [("CardDecryptionRes", "CardDecryptionReq")],
+    "MackingTime": [("MackingRes", "MackingReq")],
+    "SPTime": [("ResponseFromSP", "RequestToSP")],
+}
+
+# Stage durations, only there when the stage's end isn't logged before its
+# start (TotalTime and TotalTimeW/OSP keep the reports' original arithmetic)
+_ORDERED_DURATIONS = {"CardDecryptionTime", "MackingTime", "SPTime"}
+
+# Report columns stored as plain integers
+_NUMBER_COLUMNS = {"SrNo"}
+
+
+# Report rows kept column by column instead of as one dict per row: stage
+# times in int64 arrays (0 where a stage is missing), numbers in int64 arrays,
+# and every text column (terminal, RRNumber, TxnType ...) dictionary-encoded as
+# int32 codes into a list of its distinct values. The DURATIONS of the report
+# columns are computed for the whole batch at once when the rows are drained.
+class TransactionStore:
+    def __init__(self, columns, batch_size=STORE_BATCH):
+        self.columns = columns
+        self.batch_size = batch_size
+        self.time_columns = [col for col in columns if col in TIME_COLUMNS]
+        self.number_columns = [col for col in columns if col in _NUMBER_COLUMNS]
+        self.durations = {
+            name: spans for name, spans in DURATIONS.items()
+            if name in columns and all(stage in self.time_columns for span in spans for stage in span)
+        }
+        self.text_columns = [
+            col for col in columns
+            if col not in TIME_COLUMNS and col not in _NUMBER_COLUMNS and col not in self.durations
+        ]
+        self.clear()
+
+    def clear(self):
+        self.size = 0
+        self.times = {col: array('q') for col in self.time_columns}
+        self.numbers = {col: array('q') for col in self.number_columns}
+        self.codes = {col: array('i') for col in self.text_columns}
+        self.values = {col: [] for col in self.text_columns}  # code -> value
+        self.lookup = {col: {} for col in self.text_columns}  # value -> code
+
+    def __len__(self):
+        return self.size
+
+    def full(self):
+        return self.size >= self.batch_size
+
+    def append(self, row):
+        for col in self.time_columns:
+            self.times[col].append(row.get(col) or 0)
+        for col in self.number_columns:
+            self.numbers[col].append(row.get(col) or 0)
+        for col in self.text_columns:
+            value = row.get(col)
+            if value is None:
+                code = -1
+            else:
+                lookup = self.lookup[col]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(self.values[col])
+                    self.values[col].append(value)
+            self.codes[col].append(code)
+        self.size += 1
+
+    # Duration columns of the batch as name -> (ms values, present flags)
+    def compute_durations(self):
+        result = {}
+        for name, spans in self.durations.items():
+            if np is not None:
+                total = np.zeros(self.size, dtype=np.int64)
+                present = np.ones(self.size, dtype=bool)
+                for i, (end, start) in enumerate(spans):
+                    end_ms = np.frombuffer(self.times[end], dtype=np.int64)
+                    start_ms = np.frombuffer(self.times[start], dtype=np.int64)
+                    present &= (end_ms != 0) & (start_ms != 0)
+                    if name in _ORDERED_DURATIONS:
+                        present &= end_ms >= start_ms
+                    if i == 0:
+                        total += end_ms - start_ms
+                    else:
+                        total -= end_ms - start_ms
+                result[name] = (total.tolist(), present.tolist())
+            else:
+                total = [0] * self.size
+                present = [True] * self.size
+                for i, (end, start) in enumerate(spans):
+                    sign = 1 if i == 0 else -1
+                    for j, (end_ms, start_ms) in enumerate(zip(self.times[end], self.times[start])):
+                        if not end_ms or not start_ms or (name in _ORDERED_DURATIONS and end_ms < start_ms):
+                            present[j] = False
+                        total[j] += sign * (end_ms - start_ms)
+                result[name] = (total, present)
+        return result
+
+    # Hand out the stored rows as dicts (None where a value is missing) with
+    # their durations, and empty the store
+    def drain(self):
+        if not self.size:
+            return
+        size, times, numbers, codes, values = self.size, self.times, self.numbers, self.codes, self.values
+        durations = self.compute_durations()
+        self.clear()
+
+        for i in range(size):
+            row = {}
+            for col in self.columns:
+                if col in times:
+                    row[col] = times[col][i] or None
+                elif col in numbers:
+                    row[col] = numbers[col][i]
+                elif col in durations:
+                    duration, present = durations[col]
+                    row[col] = duration[i] if present[i] else None
+                else:
+                    code = codes[col][i]
+                    row[col] = values[col][code] if code >= 0 else None
+            yield row
+
+
+# Rows with their durations filled in, computed a store batch at a time
+def with_durations(rows, columns, batch_size=STORE_BATCH):
+    store = TransactionStore(columns, batch_size)
+    for row in rows:
+        store.append(row)
+        if store.full():
+            yield from store.drain()
+    yield from store.drain()
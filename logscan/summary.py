@@ -0,0 +1,170 @@
+import math
+import os
+import pickle
+from datetime import datetime, timezone
+
+# Stages (duration columns of the transaction reports) that get summarized
+STAGES = ["TotalTime", "TotalTimeW/OSP", "CardDecryptionTime", "MackingTime", "SPTime"]
+
+# Columns of the summary report; the latencies are in ms
+SUMMARY_COLUMNS = ["Bucket", "DeviceSerialNumber", "TxnType", "SubTxnType", "Stage", "Count", "P50", "P95", "P99", "Max"]
+
+# Bits of precision kept per value: values below 2**SUB_BUCKET_BITS ms are
+# counted exactly, bigger ones to within 1/2**(SUB_BUCKET_BITS - 1) (under 2%)
+SUB_BUCKET_BITS = 7
+
+_EXACT = 1 << SUB_BUCKET_BITS
+
+
+def _index(value):
+    if value < 0:
+        return -_index(-value) - 1
+    if value < _EXACT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def _value(index):
+    if index < 0:
+        return -_value(-index - 1)
+    if index < _EXACT:
+        return index
+    shift = index >> SUB_BUCKET_BITS
+    mantissa = index - (shift << SUB_BUCKET_BITS)
+    return (mantissa << shift) + (1 << (shift - 1))  # Middle of the bucket
+
+
+# HDR-style latency histogram: counts per log-linear bucket, so its size only
+# depends on the range of the values (a few hundred buckets at most), never on
+# how many were recorded. Two histograms merge by adding their counts.
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = {}  # bucket index -> count
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        index = _index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    # Value at quantile q (0..1), e.g. 0.99 for p99
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return max(self.min, min(_value(index), self.max))
+        return self.max
+
+
+# Latency histograms per (time bucket, terminal, TxnType, SubTxnType, stage).
+# Summaries of other files, workers or runs are folded in with merge(), and a
+# summary can be saved and loaded again, so long periods are summarized from
+# the per-run sketches without keeping any rows.
+class LatencySummary:
+    def __init__(self, bucket_ms=60 * 60 * 1000):
+        self.bucket_ms = bucket_ms
+        self.histograms = {}
+
+    def add(self, row):
+        started = row.get("TrxStart") or row.get("TrxEnd")
+        bucket = started - started % self.bucket_ms if isinstance(started, int) else None
+        key = (bucket, row.get("DeviceSerialNumber") or "", row.get("TxnType") or "", row.get("SubTxnType") or "")
+        for stage in STAGES:
+            value = row.get(stage)
+            if isinstance(value, int):
+                histogram = self.histograms.get(key + (stage,))
+                if histogram is None:
+                    histogram = self.histograms[key + (stage,)] = LatencyHistogram()
+                histogram.record(value)
+
+    def merge(self, other):
+        if other.bucket_ms != self.bucket_ms:
+            raise ValueError(f"Can't merge summaries with {other.bucket_ms // 60000} and {self.bucket_ms // 60000} minute buckets")
+        for key, histogram in other.histograms.items():
+            if key in self.histograms:
+                self.histograms[key].merge(histogram)
+            else:
+                self.histograms[key] = histogram
+
+    # One summary row per histogram, by bucket, terminal, type and stage
+    def rows(self):
+        stage_order = {stage: i for i, stage in enumerate(STAGES)}
+        keys = sorted(self.histograms, key=lambda key: (key[0] is not None, key[0] or 0, key[1], key[2], key[3], stage_order[key[4]]))
+        for key in keys:
+            bucket, terminal, txn_type, sub_txn_type, stage = key
+            histogram = self.histograms[key]
+            yield {
+                "Bucket": format_bucket(bucket),
+                "DeviceSerialNumber": terminal,
+                "TxnType": txn_type,
+                "SubTxnType": sub_txn_type,
+                "Stage": stage,
+                "Count": histogram.count,
+                "P50": histogram.percentile(0.50),
+                "P95": histogram.percentile(0.95),
+                "P99": histogram.percentile(0.99),
+                "Max": histogram.max,
+            }
+
+    def save(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+
+
+# "YYYY-MM-DD HH:MM" of a bucket start (log times are kept as if UTC)
+def format_bucket(bucket):
+    if bucket is None:
+        return ""
+    return datetime.fromtimestamp(bucket / 1000, timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+# Row sink for --summary: takes the report rows like any other sink but only
+# feeds them to a LatencySummary. On close the sketches of earlier runs
+# (merge_paths) are merged in, this run's sketches are saved to sketch_path if
+# given, and the summary rows are written to `sink`.
+class SummarySink:
+    def __init__(self, sink, bucket_ms, sketch_path=None, merge_paths=()):
+        self.sink = sink
+        self.path = sink.path
+        self.summary = LatencySummary(bucket_ms)
+        self.sketch_path = sketch_path
+        self.merge_paths = merge_paths
+
+    def write(self, row):
+        self.summary.add(row)
+
+    def close(self):
+        if self.sketch_path:
+            self.summary.save(self.sketch_path)  # This run only, so runs can be merged without double counting
+        for merge_path in self.merge_paths:
+            self.summary.merge(LatencySummary.load(merge_path))
+        for row in self.summary.rows():
+            self.sink.write(row)
+        self.sink.close()
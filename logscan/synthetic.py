@@ -0,0 +1,212 @@
+import base64
+import calendar
+import heapq
+import json
+import os
+import random
+import uuid
+from datetime import datetime, timezone
+
+# Terminals the generated transactions come from; script.py's default
+# matchingTerminalString (20049907) is one of them
+TERMINALS = [str(20049800 + i) for i in range(200)]
+
+# Transaction types with their share of the traffic (TxnType, SubTxnType)
+TXN_TYPES = [(("Sale", "Sale"), 0.8), (("Refund", "Refund"), 0.1), (("Void", "Sale"), 0.05), (("Sale", "CashBack"), 0.05)]
+
+# Thread ids the server logs from
+THREADS = 100
+
+# Bursts of noise lines (JWT checks, reconciliation ...) per transaction
+NOISE_RATE = 4
+
+# Log time of the first generated line
+START = "07 Jan 2025 17:00:00"
+
+
+def _hex(rng, length):
+    return f"{rng.getrandbits(length * 4):0{length}x}"
+
+
+# Line shapes of a ProdAPP log (as in logs-old/), filled in per transaction
+def _request_json(rng, terminal, txn_type, sub_txn_type):
+    return json.dumps({
+        "txnType": txn_type, "txnMode": "Contactless", "txnAmount": rng.randrange(100, 100000),
+        "txnDateTime": "0001-01-01T00:00:00", "dateExpiration": "2910", "originalAmount": 0, "currencyCode": 682,
+        "pinData": "", "cardType": "mada", "chipData": _hex(rng, 480), "pinKsn": "*" * 20, "sredKsn": "*" * 20,
+        "sredData": "*" * 64, "terminalStatus": _hex(rng, 116), "cardSequenceNumber": "000", "verificationType": "NONE",
+        "maskedCardNumber": "506968ffffff1119", "subTxnType": sub_txn_type, "localReferenceNumber": str(rng.randrange(100)),
+        "isOffline": "online", "deviceSerialNo": terminal, "merchantId": str(uuid.UUID(int=rng.getrandbits(128))),
+        "isPartialAmount": "0", "retryIndicator": 0, "cardholderVerificationStatus": "00", "isForcedPinTxn": False,
+    }, separators=(",", ":"))
+
+
+def _response_json(rng, terminal, txn_type, sub_txn_type, rr_number, stan):
+    return json.dumps({
+        "status": "1", "responseCode": "000", "message": "Approved", "rrNumber": rr_number,
+        "approvalCode": str(rng.randrange(100000, 999999)), "cashBackAmount": None, "de55Response": None,
+        "txnAmount": str(rng.randrange(100, 100000)), "cardSequenceNumber": "000",
+        "txnId": str(uuid.UUID(int=rng.getrandbits(128))), "deviseSerialNo": terminal, "txnMode": "Contactless",
+        "txnType": txn_type, "subTxnType": sub_txn_type, "cardType": "mada", "maskedCardNumber": "506968ffffff1119",
+        "sTraceAuditNoCreated": stan, "splitRetryIndicator": 0, "tID": "2400189040961351", "mID": "770900061351   ",
+    }, separators=(",", ":"))
+
+
+def _token(rng):
+    return "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9." + base64.urlsafe_b64encode(rng.randbytes(420)).decode("ascii")
+
+
+# Lines of one card transaction as (delay in ms since the previous line,
+# logger - message). Delays model the HSM, switch (SP) and DB round trips.
+def _transaction(rng, serial):
+    terminal = rng.choice(TERMINALS)
+    (txn_type, sub_txn_type), = rng.choices([types for types, _ in TXN_TYPES], [share for _, share in TXN_TYPES])
+    rr_number = f"{843900000000 + serial}"
+    stan = f"{serial % 1000000:06d}"
+    user = f"Sf{rng.randrange(1, 500)}@ip.com"
+
+    yield 0, "JWTBearerHandler - JWTBearerHandler"
+    yield 6, f"JWTBearerHandler -  Token:{_token(rng)}"
+    yield rng.randrange(20, 120), "TransactionController - Transaction Received. "
+    yield 6, f"TransactionController - ({terminal}) Request Received: {txn_type}"
+    yield 5, f"TransactionController - ({terminal}) Request JSON: {_request_json(rng, terminal, txn_type, sub_txn_type)}"
+    yield 4, f"RequestValidationBL - CheckRequestValidation Username= {user}"
+    yield 6, f"RequestValidationBL - CheckRequestValidation Username= {user}"
+    yield 4, f"TransactionBL - ---------- Transaction Started ({terminal}) MTI:1200 ----------"
+    yield 10, f"FuturexGrain - ({terminal}) Request Sent to HSM for Card details"
+    yield rng.randrange(40, 700), f"FuturexGrain - ({terminal}) Decryption of Card details successfully. Length = 64"
+    yield 4, "MessagePackingGrain - ISO Message Packing Starts."
+    for field, text in (("DE7", "TransDateTime (0107140052)"), ("DE11", f"Systems Trace Audit Number ({stan})"),
+                        ("DE24", "Function Code (200)"), ("DE32", "Acquirer Institution Identification Code (432328)"),
+                        ("DE41", "Card Acceptor Terminal Identification (2400231541167063)")):
+        yield 5, f"MessagePackingGrain - ({terminal}) {field} {text}"
+    yield 5, f"MessagePackingGrain - ({terminal}) Request Sent to HSM for Macking"
+    yield rng.randrange(2, 20), f"FuturexGrain - ({terminal}) Macking successfully. Length = 8"
+    yield 4, f"MessagePackingGrain - ({terminal}) DE128 Message Authentication Code ({_hex(rng, 8).upper()}FFFFFFFF)"
+    yield 4, f"MessagePackingGrain - ({terminal}) ISO Parsed message Send Request Length : {rng.randrange(400, 1400)}"
+    yield 5, "DatabaseGrain - SREDKSN Fetched Successfully"
+    yield 6, "DatabaseGrain - SREDKSN Updated Successfully"
+    yield 10, f"SaveFileActionGrain - ISO Packed Message to send {_hex(rng, 240)}"
+    yield 8, "SaveFileActionGrain - Persistent connection true "
+    yield rng.randrange(150, 2500), f"ConnectionFileAppender - ISO Parsed message Received Response Length: {rng.randrange(900, 2000)}  Port - 9096"
+    yield 4, "MessageUnpackGrain - State Value: "
+    yield 4, "MessageUnpackGrain - Response MTI: 1210"
+    yield 4, f"MessageUnpackGrain - sPrimaryBit: {_hex(rng, 32)}"
+    for field in ("DE2Length-16", "DE3-000000", "DE4-000000002000", "DE7-0107140027", "DE11-" + stan, "DE12-250107170027",
+                  "DE37-" + rr_number, "DE38-902631", "DE39-000", "DE41-2400189040961351", "DE49-682"):
+        yield 4, f"MessageUnpackGrain - {field}-{_hex(rng, 24)}"
+    yield 4, "DatabaseGrain - Changed Terminal is reconciled set toFalse"
+    yield 4, "DatabaseGrain - Trasnaction Record Response Updated Successfully"
+    yield 5, "DatabaseGrain - LastTransactionDate Updated Successfully"
+    yield 5, f"TransactionController - ({terminal}) Response Status: 1, Message : Approved, RRN: {rr_number}, STAN: {stan}"
+    yield 5, f"TransactionController - ({terminal}) Transaction Response JSON: {_response_json(rng, terminal, txn_type, sub_txn_type, rr_number, stan)}"
+    yield 4, f"TransactionController - ========== Transaction End ({terminal}) MTI:1200 =========="
+
+
+# Lines logged between transactions: JWT checks, terminal log downloads,
+# background reconnects, reconciliation messages and GetSSLFingerprint requests
+def _noise(rng, serial):
+    kind = rng.randrange(5)
+    if kind == 0:
+        yield 0, "JWTBearerHandler - JWTBearerHandler"
+        yield 6, f"JWTBearerHandler -  Token:{_token(rng)}"
+    elif kind == 1:
+        yield 0, "AuthController - Terminal log Request received"
+        yield 5, "AuthorizationBL - FetchTerminalLog"
+        yield 8, "DatabaseGrain - Terminal log Reuest  Dates fetched"
+    elif kind == 2:
+        yield 0, "ConnectionFileAppender - The Background reconnect executed"
+    elif kind == 3:
+        # Reconciliation: an ISO exchange with no terminal in front of its lines
+        yield 0, "MessagePackingGrain - ISO Message Packing Starts."
+        for field in ("DE3", "DE7", "DE11", "DE12", "DE24", "DE32", "DE41", "DE42", "DE53", "DE62"):
+            yield 3, f"MessagePackingGrain - {field} {_hex(rng, 12)}"
+        yield rng.randrange(100, 900), "MessageUnpackGrain - Response MTI: 1510"
+        for field in ("cardSchemeId", "cardSchemeAcquireId", "DebitCount", "DebitAmount", "CreditCount", "CreditAmount",
+                      "CashBackAmount", "CashAdvanceAmount", "AuthorizationCount"):
+            yield 2, f"DatabaseGrain - {field} Parsed : {rng.randrange(100000)}"
+    else:
+        user = f"user{rng.randrange(1, 400)}@ip.com"
+        request = {"deviceId": serial, "lastModifiedDate": f"2025-01-0{rng.randrange(1, 10)}T10:00:00"}
+        yield 0, f"AuthController - GetSSLFingerprint Request received:{user}:{json.dumps(request, separators=(',', ':'))}"
+        if rng.random() < 0.9:
+            response = {"status": "1", "fingerprintList": [f"AB:CD:{i:02d}" for i in range(rng.randrange(5))]}
+            yield rng.randrange(5, 50), f"AuthController - GetSSLFingerprint Response sent:{user}:{json.dumps(response, separators=(',', ':'))}"
+
+
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _second_text(second):
+    parsed = datetime.fromtimestamp(second, timezone.utc)
+    return f"{parsed.day:02d} {_MONTHS[parsed.month - 1]} {parsed.year} {parsed.hour:02d}:{parsed.minute:02d}:{parsed.second:02d}"
+
+
+# Write synthetic ProdAPP logs of about size_mb MB in total into folder, one
+# *_log_YYYY-MM-DD-HH.txt file per hour of log time, and return the number
+# of (files, lines, bytes) written.
+#
+# Transactions arrive at `tps` per second of log time and run concurrently on
+# random threads, so their lines interleave like in the real logs; noise lines
+# come in between. With uuids=True every line of a transaction carries its
+# UUID after the thread id (the new log format). The same seed gives the same
+# logs. Transactions are numbered (RRNumber, STAN) from first_serial + 1, so
+# the logs of several servers can be told apart.
+def generate_logs(folder, size_mb, tps=50, uuids=False, seed=1, prefix="ProdAPP02_log", first_serial=0):
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    target = int(size_mb * 1024 * 1024)
+    clock = calendar.timegm(datetime.strptime(START, "%d %b %Y %H:%M:%S").timetuple()) * 1000
+
+    pending = []  # (time of the next line, order, thread, uuid, its message, line source)
+    order = 0
+    next_transaction = next_noise = clock
+    serial = first_serial
+    written = lines = files = 0
+    file = None
+    file_hour = None
+    second, second_text = None, None
+    while written < target:
+        # Start the transactions and noise due before the next pending line
+        while not pending or min(next_transaction, next_noise) <= pending[0][0]:
+            serial += 1
+            if next_transaction <= next_noise:
+                source, at = _transaction(rng, serial), next_transaction
+                next_transaction += int(rng.expovariate(tps) * 1000) + 1
+            else:
+                source, at = _noise(rng, serial), next_noise
+                next_noise += int(rng.expovariate(tps * NOISE_RATE) * 1000) + 1
+            line_uuid = str(uuid.UUID(int=rng.getrandbits(128))) if uuids else None
+            delay, message = next(source)
+            heapq.heappush(pending, (at + delay, order, rng.randrange(1, THREADS + 1), line_uuid, message, source))
+            order += 1
+
+        at, line_order, thread, line_uuid, message, source = heapq.heappop(pending)
+        if file_hour != at // 3600000:
+            if file is not None:
+                file.close()
+            file_hour = at // 3600000
+            hour = datetime.fromtimestamp(file_hour * 3600, timezone.utc)
+            file = open(os.path.join(folder, f"{prefix}_{hour:%Y-%m-%d-%H}.txt"), 'w', encoding='utf-8', newline='\n')
+            files += 1
+        if second != at // 1000:
+            second = at // 1000
+            second_text = _second_text(second)
+
+        if line_uuid:
+            line = f"{second_text},{at % 1000:03d} [{thread}] [{line_uuid}] INFO  {message}\n"
+        else:
+            line = f"{second_text},{at % 1000:03d} [{thread}] INFO  {message}\n"
+        file.write(line)
+        written += len(line)
+        lines += 1
+
+        # The next line of the same source, after its delay
+        following = next(source, None)
+        if following is not None:
+            delay, message = following
+            heapq.heappush(pending, (at + delay, line_order, thread, line_uuid, message, source))
+
+    if file is not None:
+        file.close()
+    return files, lines, written
@@ -0,0 +1,90 @@
+import calendar
+import re
+from datetime import timedelta
+
+# Report columns holding a log time. Rows keep them as int milliseconds since
+# the epoch; they only become "HH:MM:SS.fff" text when a report is written.
+TIME_COLUMNS = {
+    "TrxStart", "CardDecryptionReq", "CardDecryptionRes", "MackingReq", "MackingRes",
+    "RequestToSP", "ResponseFromSP", "TrxEnd", "ResponseTime",
+}
+
+# Report columns holding a duration, kept as int milliseconds in rows
+DURATION_COLUMNS = {"TotalTime", "TotalTimeW/OSP", "CardDecryptionTime", "MackingTime", "SPTime"}
+
+_MONTHS = {}
+for _number, _name in enumerate(("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), start=1):
+    _MONTHS[_name] = _number
+    _MONTHS[_name.encode("ascii")] = _number
+
+# Timestamp every log line starts with: "07 Jan 2025 17:00:26,704". Only used
+# when a line doesn't start with it at the fixed offsets.
+TIMESTAMP_PATTERN = re.compile(r"(\d{2} \w{3} \d{4}) (\d{2}):(\d{2}):(\d{2}),(\d{3})")
+_TIMESTAMP_PATTERN_BYTES = re.compile(TIMESTAMP_PATTERN.pattern.encode("ascii"))
+
+_day_cache = {}  # "07 Jan 2025" (str or bytes) -> epoch ms of that midnight
+
+
+def _day_ms(date):
+    day_ms = _day_cache.get(date)
+    if day_ms is None:
+        month = _MONTHS.get(date[3:6])
+        if month is None:
+            return None
+        day_ms = calendar.timegm((int(date[7:11]), month, int(date[0:2]), 0, 0, 0)) * 1000
+        _day_cache[date] = day_ms
+    return day_ms
+
+
+# Epoch milliseconds of the timestamp in front of a log line (str or bytes),
+# or None when it has none. The fixed layout is read by slicing, with one
+# date lookup per distinct day, so there is no regex or strptime per line.
+# Log times carry no zone and are taken as if they were UTC.
+def line_ms(line):
+    try:
+        if line[20:21] in (",", b","):
+            day_ms = _day_ms(line[0:11])
+            if day_ms is not None:
+                return (day_ms + int(line[12:14]) * 3600000 + int(line[15:17]) * 60000
+                        + int(line[18:20]) * 1000 + int(line[21:24]))
+    except ValueError:
+        pass
+
+    pattern = _TIMESTAMP_PATTERN_BYTES if isinstance(line, bytes) else TIMESTAMP_PATTERN
+    m = pattern.search(line)
+    if not m:
+        return None
+    day_ms = _day_ms(m.group(1))
+    if day_ms is None:
+        return None
+    hours, minutes, seconds, milliseconds = (int(part) for part in m.groups()[1:])
+    return day_ms + hours * 3600000 + minutes * 60000 + seconds * 1000 + milliseconds
+
+
+# "HH:MM:SS.fff" of an epoch-ms time, as the reports show it
+def format_ms(ms):
+    seconds, milliseconds = divmod(ms % 86400000, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+# A duration in ms as the reports show it (str(timedelta), e.g.
+# "0:00:01.072000"); blank for a missing or zero duration
+def format_duration(ms):
+    if not ms:
+        return ""
+    return str(timedelta(milliseconds=ms))
+
+
+# Report text of a row value: times and durations kept as int ms are
+# formatted, everything else is written as it is
+def display_value(column, value):
+    if isinstance(value, int):
+        if column in TIME_COLUMNS:
+            return format_ms(value)
+        if column in DURATION_COLUMNS:
+            return format_duration(value)
+    elif value is None:
+        return ""
+    return value
@@ -0,0 +1,169 @@
+import calendar
+import mmap
+import os
+import re
+from datetime import datetime
+
+from logscan import stats
+from logscan.reader import complete_end, is_compressed
+from logscan.timestamps import TIME_COLUMNS, line_ms
+
+# Hour a log file covers, from the end of its name: ProdAPP02_log_2025-01-07-17.txt
+FILE_HOUR_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})-(\d{2})(?:\.txt)?(?:\.gz|\.bz2|\.zst)?$')
+
+HOUR_MS = 3600 * 1000
+
+# Formats --from / --to are given in; times are taken as UTC like the log times
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%d %b %Y %H:%M:%S", "%d %b %Y %H:%M")
+
+# Below this many bytes the binary search reads the rest line by line
+LINEAR_SEARCH_SIZE = 64 * 1024
+
+
+# Epoch ms of a --from / --to value such as "2025-01-07 17:20"
+def parse_time(text):
+    for time_format in TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(text.strip(), time_format)
+        except ValueError:
+            continue
+        return calendar.timegm(parsed.timetuple()) * 1000
+    raise ValueError(f"{text!r} is not a time like \"2025-01-07 17:20\" or \"07 Jan 2025 17:20:00\"")
+
+
+# Epoch ms of the hour a log file covers, from its name, or None when the name
+# carries no hour
+def file_hour_ms(file_path):
+    m = FILE_HOUR_PATTERN.search(os.path.basename(file_path))
+    if not m:
+        return None
+    year, month, day, hour = (int(part) for part in m.groups())
+    return calendar.timegm((year, month, day, hour, 0, 0)) * 1000
+
+
+# Offset of the first line of [start, end) logged at or after `ms`, or `end`
+# when there is none. Log times never go back, so the offset is found by
+# binary search: seek, skip to the next line, read its time. Lines without a
+# timestamp (continuations of the line before) are stepped over.
+def find_offset(mapped, ms, start, end):
+    lo, hi = start, end
+    while hi - lo > LINEAR_SEARCH_SIZE:
+        mid = (lo + hi) // 2
+        newline = mapped.find(b"\n", mid - 1, hi)
+        if newline == -1 or newline + 1 >= hi:
+            break  # No line starts in [mid, hi)
+        line_start = newline + 1
+        pos, line_end, stamp = _next_stamped(mapped, line_start, hi)
+        if stamp is not None and stamp < ms:
+            lo = line_end
+        else:
+            hi = line_start
+
+    pos = lo
+    while pos < hi:
+        stamped, line_end, stamp = _next_stamped(mapped, pos, hi)
+        if stamp is None:
+            return hi
+        if stamp >= ms:
+            return stamped
+        pos = line_end
+    return hi
+
+
+# (offset, end, time) of the first line with a timestamp in [pos, end), or
+# (end, end, None)
+def _next_stamped(mapped, pos, end):
+    while pos < end:
+        newline = mapped.find(b"\n", pos, end)
+        line_end = end if newline == -1 else newline + 1
+        stamp = line_ms(mapped[pos:min(line_end, pos + 64)])
+        if stamp is not None:
+            return pos, line_end, stamp
+        pos = line_end
+    return end, end, None
+
+
+# The --from / --to time window of a run. Lines logged from `from_ms` minus
+# the margin up to (not including) `to_ms` plus the margin are read, so
+# transactions already in flight at either edge come out whole; only rows
+# overlapping the window itself are reported (see WindowSink). Files whose
+# name says they cover another hour are skipped without being opened; in the
+# others the window is found by binary search, so a run costs what the window
+# holds, not what the files hold. Compressed logs can't be seeked: they are
+# read whole and their events outside the window dropped (see scan_range).
+class TimeWindow:
+    def __init__(self, from_ms=None, to_ms=None, margin_ms=0):
+        self.from_ms = from_ms
+        self.to_ms = to_ms
+        self.margin_ms = margin_ms
+
+    # Whether a file may hold lines of the window, going by its name
+    def covers(self, file_path):
+        hour_ms = file_hour_ms(file_path)
+        if hour_ms is None:
+            return True
+        first, last = self.time_range()
+        if first is not None and hour_ms + HOUR_MS <= first:
+            return False
+        if last is not None and hour_ms >= last:
+            return False
+        return True
+
+    # [first, last) epoch ms of the lines read, None for an open side
+    def time_range(self):
+        first = self.from_ms - self.margin_ms if self.from_ms is not None else None
+        last = self.to_ms + self.margin_ms if self.to_ms is not None else None
+        return first, last
+
+    # [from, to) epoch ms of the window itself, without the margin
+    def exact_range(self):
+        return self.from_ms, self.to_ms
+
+    # Whether a transaction running from first_ms to last_ms overlaps the window
+    def overlaps(self, first_ms, last_ms):
+        return (self.from_ms is None or last_ms >= self.from_ms) and (self.to_ms is None or first_ms < self.to_ms)
+
+    # The files of file_paths that may hold lines of the window
+    def files(self, file_paths):
+        return [file_path for file_path in file_paths if self.covers(file_path)]
+
+    # Byte range [start, end) of a file holding the window (end None for the
+    # whole of a compressed file)
+    def byte_range(self, file_path):
+        if is_compressed(file_path):
+            return 0, None
+        end = complete_end(file_path)
+        if end == 0:
+            return 0, 0
+        with open(file_path, 'rb') as raw_file:
+            with mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                first, last = self.time_range()
+                start = find_offset(mapped, first, 0, end) if first is not None else 0
+                if last is not None:
+                    end = find_offset(mapped, last, start, end)  # First line past the window
+        return start, end
+
+
+# Row sink of a --from / --to run: drops the rows of transactions read from
+# the margin that don't overlap the window (ended before it or started after
+# it), going by the row's first and last time. Rows without times are kept.
+# SrNo is numbered again over the rows kept.
+class WindowSink:
+    def __init__(self, sink, window):
+        self.sink = sink
+        self.path = sink.path
+        self.window = window
+        self.sr_no = 1
+
+    def write(self, row):
+        times = [row[col] for col in TIME_COLUMNS if isinstance(row.get(col), int)]
+        if times and not self.window.overlaps(min(times), max(times)):
+            stats.count("window", "rows outside the window")
+            return
+        if "SrNo" in row:
+            row["SrNo"] = self.sr_no
+            self.sr_no += 1
+        self.sink.write(row)
+
+    def close(self):
+        self.sink.close()
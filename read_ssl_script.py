@@ -1,9 +1,12 @@
 import os
 import re
 import json
-from datetime import datetime
-from openpyxl import Workbook
-from openpyxl.styles import Font
+import hashlib
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from logscan import stats
+from logscan.cli import build_parser, open_report
+from logscan.extract import Extractor, run_reports
 
 # Create folder if not exists
 os.makedirs("Exports", exist_ok=True)
@@ -20,88 +23,163 @@ columns = ["SrNo", "FilePath", "ResponseTime", "UserName", "LastModifiedDate", "
 request_pattern = re.compile(r"GetSSLFingerprint Request received:([^:]+):({.*})")
 response_pattern = re.compile(r"GetSSLFingerprint Response sent:([^:]+):({.*})")
 
-# Updated regex to extract full datetime with milliseconds
-dateTimePattern = re.compile(r"(\d{2} \w{3} \d{4} \d{2}:\d{2}:\d{2}),(\d{3})")
-
-# Process log files
-def process_requests(file_path, user_data, sr_counter):
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            # Handle request line
-            request_match = request_pattern.search(line)
-            if request_match:
-                username, json_str = request_match.groups()
-                try:
-                    json_data = json.loads(json_str)
-                    last_modified = json_data.get("lastModifiedDate", "")
-                except json.JSONDecodeError:
-                    last_modified = ""
-
-                if username in user_data:
-                    user_data[username]["LastModifiedDate"] = last_modified
-                else:
-                    user_data[username] = {
-                        "SrNo": sr_counter,
-                        "FilePath": file_path,
-                        "UserName": username,
-                        "LastModifiedDate": last_modified,
-                        "ResponseTime": "",
-                        "ResponseData": ""
-                    }
-                    sr_counter += 1
-
-            # Handle response line
-            response_match = response_pattern.search(line)
-            if response_match:
-                username, json_str = response_match.groups()
-
-                # Extract response timestamp
-                response_datetime = ''
-                time_match = dateTimePattern.search(line)
-                if time_match:
-                    raw_datetime = f"{time_match.group(1)},{time_match.group(2)}"  # "08 May 2025 13:23:46,024"
-                    try:
-                        dt_obj = datetime.strptime(raw_datetime, "%d %b %Y %H:%M:%S,%f")
-                        response_datetime = dt_obj.strftime("%Y-%m-%d %H:%M:%S")  # Standard format
-                    except ValueError:
-                        response_datetime = raw_datetime  # Fallback in case of parsing issue
-
-                if username in user_data:
-                    user_data[username]["ResponseTime"] = response_datetime
-                    user_data[username]["ResponseData"] = json_str
+# The one field of a request payload the report needs, read without parsing
+# the whole JSON
+last_modified_pattern = re.compile(r'"lastModifiedDate"\s*:\s*("(?:[^"\\]|\\.)*"|[^,}\s]*)')
+
+# What the report keeps of each response payload (--response-data)
+RESPONSE_DATA = ("full", "sha256", "length")
+
+
+# "lastModifiedDate" of a request payload, "" when it has none. Payloads
+# naming the field more than once (nested objects) are parsed in full so the
+# top-level one wins, as with json.loads(...).get().
+def last_modified_date(json_str):
+    m = last_modified_pattern.search(json_str)
+    if m is None:
+        return ""
+    if json_str.count('"lastModifiedDate"') > 1:
+        try:
+            return json.loads(json_str).get("lastModifiedDate", "")
+        except json.JSONDecodeError:
+            return ""
+    value = m.group(1)
+    if value.startswith('"') and "\\" not in value:
+        return value[1:-1]
+    try:
+        return json.loads(value)  # Escaped text, null, a number ...
+    except json.JSONDecodeError:
+        return ""
+
+
+# Response timestamp in the standard format, without the milliseconds; one
+# strftime per distinct second
+@lru_cache(maxsize=4096)
+def response_time(second):
+    return datetime.fromtimestamp(second, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ResponseData as the report keeps it: the payload, its SHA-256 or its length
+def response_data(json_str, mode="full"):
+    if mode == "sha256":
+        return hashlib.sha256(json_str.encode("utf-8")).hexdigest()
+    if mode == "length":
+        return len(json_str)
+    return json_str
+
+
+# Summary of the GetSSLFingerprint lines of one log file (or the byte range
+# [start, end) of it): what it says about each user, without touching the
+# report, so files and ranges of big files can be summarized in parallel and
+# merged in order afterwards. `mode` is what is kept of each ResponseData.
+def summarize_events(file_path, events, mode="full"):
+    users = {}     # username -> LastModifiedDate of the last request, and the last response after it
+    orphans = {}   # username -> last response seen before any request from that user in this file
+    for _, values, event_ms in events:
+        # Handle request line
+        if "Request" in values:
+            username, json_str = values["Request"]
+            users.setdefault(username, {})["LastModifiedDate"] = last_modified_date(json_str)
+
+        # Handle response line
+        if "Response" in values:
+            username, json_str = values["Response"]
+
+            response_datetime = response_time(event_ms // 1000) if event_ms is not None else ''
+            response = {"ResponseTime": response_datetime, "ResponseData": response_data(json_str, mode)}
+            if username in users:
+                users[username]["Response"] = response
+            else:
+                orphans[username] = response
+
+    return file_path, users, orphans
+
+
+# What the report takes from the log lines: every GetSSLFingerprint request and
+# response, whichever logger writes it. Both patterns start with a literal, so
+# only lines holding one of them get a regex run at all.
+def new_extractor(mode="full"):
+    summarize = summarize_events if mode == "full" else partial(summarize_events, mode=mode)
+    return Extractor("ssl", {"Request": request_pattern, "Response": response_pattern}, prefilter=None, summarize=summarize)
+
+
+# Merge one file's summary into the report, in the same way as if its lines
+# had been read right after the previous file's
+def merge_requests(user_data, summary, sr_counter):
+    file_path, users, orphans = summary
+
+    # Responses before any request in this file only count for users already known
+    for username, response in orphans.items():
+        if username in user_data:
+            user_data[username].update(response)
+
+    for username, user in users.items():
+        if username in user_data:
+            user_data[username]["LastModifiedDate"] = user["LastModifiedDate"]
+        else:
+            user_data[username] = {
+                "SrNo": sr_counter,
+                "FilePath": file_path,
+                "UserName": username,
+                "LastModifiedDate": user["LastModifiedDate"],
+                "ResponseTime": "",
+                "ResponseData": ""
+            }
+            sr_counter += 1
+
+        if "Response" in user:
+            user_data[username].update(user["Response"])
 
     return sr_counter
 
-# Write to Excel
-def write_to_excel(user_data, output_file):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Fingerprint Requests"
 
-    # Header
-    for col_idx, col in enumerate(columns, 1):
-        cell = ws.cell(row=1, column=col_idx, value=col)
-        cell.font = Font(bold=True)
-
-    # Rows
-    for idx, user in enumerate(user_data.values(), start=2):
-        for col_idx, col in enumerate(columns, 1):
-            ws.cell(row=idx, column=col_idx, value=user.get(col, ""))
-
-    wb.save(output_file)
-    print(f"Report saved to {output_file}")
+# Write the rows of every user to a report sink
+def write_report(user_data, sink):
+    for user in user_data.values():
+        sink.write(user)
+    sink.close()
+    print(f"Report saved to {sink.path}")
+
+# The report of one run: users are merged file by file, the report is written
+# once every file is in. With --checkpoint the users of earlier runs are kept
+# and the whole report is written again with them.
+class Report:
+    def __init__(self, args, name_suffix=""):
+        self.extractor = new_extractor(args.response_data)
+        self.sink = open_report(args, columns, output_file, "Fingerprint Requests", bold_header=True, name_suffix=name_suffix,
+                                rewritten=True)
+        self.user_data = {}
+        self.sr_counter = 1
+
+    def add_file(self, file_path, summaries):
+        for summary in summaries:
+            self.sr_counter = merge_requests(self.user_data, summary, self.sr_counter)
+
+    # What --checkpoint keeps for the next run (see run_reports)
+    def suspend(self):
+        return {"user_data": self.user_data, "sr_counter": self.sr_counter}
+
+    def resume(self, state, continued):
+        self.user_data, self.sr_counter = state["user_data"], state["sr_counter"]
+
+    def close(self):
+        stats.count("ssl", "users reported", len(self.user_data))
+        write_report(self.user_data, self.sink)
+
+# Options of this report on top of the shared ones
+def add_arguments(parser):
+    parser.add_argument(
+        "--response-data", choices=RESPONSE_DATA, default="full",
+        help="Keep each ResponseData as the full payload, its sha256 or its length (default %(default)s)",
+    )
 
 # Main function
 def main():
-    user_data = {}
-    sr_counter = 1
-
-    for file_name in os.listdir(log_folder):
-        if file_name.endswith(".txt"):
-            file_path = os.path.join(log_folder, file_name)
-            sr_counter = process_requests(file_path, user_data, sr_counter)
+    parser = build_parser("Extract GetSSLFingerprint requests per user into an Excel report")
+    add_arguments(parser)
+    args = parser.parse_args()
 
-    write_to_excel(user_data, output_file)
+    run_reports(args, [Report(args)], log_folder, os.path.basename(__file__))
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
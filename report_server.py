@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import chain
+from urllib.parse import parse_qs, urlparse
+
+import script_read_all_terminal
+import script_read_all_terminal_new_format_cert
+from logscan.extract import scan_range
+from logscan.index import CACHE_SIZE, FileIndex, TransactionIndex
+from logscan.parallel import map_file_ranges
+from logscan.reader import CHUNK_SIZE, list_log_files
+from logscan.store import with_durations
+from logscan.timestamps import display_value
+from logscan.window import parse_time
+
+# Paths
+log_folder = "logs"  # Folder where the log files are located
+
+
+# Report rows of one scanned file, for the reports the server can index. Each
+# file is deduplicated on its own (as a file is rescanned whole when it grows).
+def cert_rows(events, file_path):
+    module = script_read_all_terminal_new_format_cert
+    return with_durations(module.iter_rows(events, module.new_correlator()), module.columns)
+
+
+def all_terminal_rows(events, file_path):
+    module = script_read_all_terminal
+    return with_durations(module.iter_rows(events, file_path), module.columns)
+
+
+# name -> (script, rows of one file)
+reports = {
+    "cert": (script_read_all_terminal_new_format_cert, cert_rows),
+    "all_terminal": (script_read_all_terminal, all_terminal_rows),
+}
+
+# Query parameters of /transactions and the TransactionIndex.query argument
+# each one goes to
+QUERY_PARAMETERS = {
+    "terminal": "terminal",
+    "rrn": "rrn",
+    "txn_type": "txn_type",
+    "from": "from_ms",
+    "to": "to_ms",
+    "min_total_ms": "min_total_ms",
+    "limit": "limit",
+}
+
+DEFAULT_LIMIT = 1000
+
+
+# Keeps a TransactionIndex of one report over a log folder up to date: files
+# that are new or changed since the last refresh are scanned again (in
+# parallel) and their rows replace the old ones; removed files are dropped.
+class IndexBuilder:
+    def __init__(self, report, log_folder, engine="text", workers=1, chunk_size=CHUNK_SIZE, cache_size=CACHE_SIZE):
+        self.report = report
+        self.module, self.build_rows = reports[report]
+        self.log_folder = log_folder
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.scan = partial(scan_range, engine=engine, extractors=[self.module.extractor])
+        self.index = TransactionIndex(cache_size)
+        self.file_states = {}  # file path -> (size, mtime) when it was indexed
+        self.refresh_lock = threading.Lock()
+        self.refreshed = None
+
+    # Index what changed; returns how many files were (re)scanned or dropped
+    def refresh(self):
+        with self.refresh_lock:
+            current = {}
+            for file_path in list_log_files(self.log_folder):
+                stat = os.stat(file_path)
+                current[file_path] = (stat.st_size, stat.st_mtime)
+            changed = [file_path for file_path, state in current.items() if self.file_states.get(file_path) != state]
+            removed = [file_path for file_path in self.file_states if file_path not in current]
+
+            file_indexes = {}
+            for file_path, range_results in map_file_ranges(self.scan, changed, self.workers, self.chunk_size):
+                events = chain.from_iterable(results[0] for results in range_results)
+                file_indexes[file_path] = FileIndex(list(self.build_rows(events, file_path)))
+            if file_indexes or removed:
+                self.index.replace_files(file_indexes, removed)
+            self.file_states = current
+            self.refreshed = time.time()
+            return len(changed) + len(removed)
+
+    # Refresh every `seconds` until the process ends
+    def refresh_every(self, seconds):
+        while True:
+            time.sleep(seconds)
+            try:
+                self.refresh()
+            except Exception as error:  # A bad file must not stop the server
+                print(f"Refresh failed: {error}")
+
+    def status(self):
+        index = self.index
+        return {
+            "report": self.report,
+            "files": len(index.files),
+            "rows": index.row_count(),
+            "refreshed": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.refreshed)) if self.refreshed else None,
+            "cache_entries": len(index.cache),
+            "cache_hits": index.hits,
+            "cache_misses": index.misses,
+        }
+
+
+# Arguments of TransactionIndex.query from the query string of /transactions
+def query_arguments(query_string):
+    arguments = {"limit": DEFAULT_LIMIT}
+    for name, values in parse_qs(query_string).items():
+        if name not in QUERY_PARAMETERS:
+            raise ValueError(f"unknown parameter {name!r}; use {', '.join(QUERY_PARAMETERS)}")
+        value = values[-1]
+        if name in ("from", "to"):
+            value = parse_time(value)
+        elif name in ("min_total_ms", "limit"):
+            value = int(value)
+        arguments[QUERY_PARAMETERS[name]] = value
+    return arguments
+
+
+# JSON API of the report server:
+#   GET /transactions?terminal=&rrn=&txn_type=&from=&to=&min_total_ms=&limit=
+#   GET /status
+#   POST /refresh (or GET) to pick up new log files right away
+class RequestHandler(BaseHTTPRequestHandler):
+    builder = None  # Set on the class made by make_handler
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/transactions":
+            try:
+                arguments = query_arguments(url.query)
+            except ValueError as error:
+                self.send_json(400, {"error": str(error)})
+                return
+            started = time.perf_counter()
+            total, rows = self.builder.index.query(**arguments)
+            columns = [col for col in self.builder.module.columns if col != "SrNo"]  # SrNo only numbers a report file
+            self.send_json(200, {
+                "count": total,
+                "returned": len(rows),
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+                "rows": [{col: display_value(col, row.get(col, "")) for col in columns} for row in rows],
+            })
+        elif url.path == "/status":
+            self.send_json(200, self.builder.status())
+        elif url.path == "/refresh":
+            self.do_POST()
+        else:
+            self.send_json(404, {"error": "use /transactions, /status or /refresh"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/refresh":
+            self.send_json(404, {"error": "use POST /refresh"})
+            return
+        self.send_json(200, {"updated_files": self.builder.refresh(), **self.builder.status()})
+
+    def send_json(self, status, body):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix socket"
+
+
+def make_handler(builder):
+    return type("Handler", (RequestHandler,), {"builder": builder})
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+# Main code: index the logs once, then answer queries until Ctrl+C
+def main():
+    parser = argparse.ArgumentParser(description="Serve queries over the parsed transactions of the logs from memory")
+    parser.add_argument(
+        "--report", choices=tuple(reports), default="cert",
+        help="Rows to index: cert (UUID log format, with TxnType) or all_terminal (default %(default)s)",
+    )
+    parser.add_argument(
+        "--logs", metavar="FOLDER", default=log_folder,
+        help="Folder of the log files (default %(default)s)",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1",
+        help="Address to listen on (default %(default)s, this machine only)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=8765,
+        help="HTTP port (default %(default)s)",
+    )
+    parser.add_argument(
+        "--socket", metavar="PATH",
+        help="Listen on this Unix socket instead of a TCP port",
+    )
+    parser.add_argument(
+        "--refresh-seconds", type=float, default=60,
+        help="Look for new or grown log files this often (default %(default)s; 0 = only on POST /refresh)",
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=CACHE_SIZE,
+        help="Query results kept in the LRU cache (default %(default)s)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of worker processes parsing log files (0 = one per CPU, default 1)",
+    )
+    parser.add_argument(
+        "--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024),
+        help="With several workers, split files bigger than this many MB into ranges scanned in parallel",
+    )
+    parser.add_argument(
+        "--engine", choices=("text", "bytes"), default="text",
+        help="text decodes every line; bytes scans the mmapped file and decodes only captured values",
+    )
+    args = parser.parse_args()
+
+    builder = IndexBuilder(args.report, args.logs, args.engine, args.workers, max(args.chunk_mb, 1) * 1024 * 1024, args.cache_size)
+    started = time.perf_counter()
+    builder.refresh()
+    status = builder.status()
+    print(f"Indexed {status['rows']} rows of {status['files']} files in {time.perf_counter() - started:.1f} s")
+
+    if args.refresh_seconds > 0:
+        threading.Thread(target=builder.refresh_every, args=(args.refresh_seconds,), daemon=True).start()
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, make_handler(builder))
+        print(f"Serving on unix socket {args.socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(builder))
+        print(f"Serving on http://{args.host}:{args.port}/transactions?terminal=...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass  # Ctrl+C stops the server
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
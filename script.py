@@ -1,8 +1,13 @@
 import os
 from datetime import datetime
 import re
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import Font
+from itertools import chain
+from logscan import stats
+from logscan.cli import build_parser, open_follow_sink, open_report, open_seen_keys, save_seen_keys
+from logscan.dedup import SeenKeys
+from logscan.extract import Extractor, run_reports
+from logscan.follow import follow_files
+from logscan.store import TransactionStore, with_durations
 
 #Create folder if not exists
 os.makedirs("TerminalExports", exist_ok=True)
@@ -17,16 +22,17 @@ output_file = os.path.join("TerminalExports", f"All_Terminal_Report_{current_tim
 # Column names in the Excel file (must match exactly with your sheet, updated to lowercase)
 columns = [
     "SrNo", "FilePath", "DeviceSerialNumber", "RRNumber", "TxnType", "TrxStart", "CardDecryptionReq", "CardDecryptionRes",
-    "MackingReq", "MackingRes", "RequestToSP", "ResponseFromSP", "TrxEnd", "TotalTime", "TotalTimeW/OSP"
+    "MackingReq", "MackingRes", "RequestToSP", "ResponseFromSP", "TrxEnd", "TotalTime", "TotalTimeW/OSP",
+    "CardDecryptionTime", "MackingTime", "SPTime"
 ]
 
 
-#Give terminal number for which get logs
+#Give terminal number for which get logs (or pass several with --terminals / --terminals-file)
 matchingTerminalString = "20049907"
 
 # Field mapping for regex extraction (field names to match in log files)
 patterns = {
-    "TrxStart": re.compile(rf'TransactionController - \({matchingTerminalString}\) Request Received: Sale'),
+    "TrxStart": re.compile(r'TransactionController - \((\d+)\) Request Received: Sale'),  # Captures the terminal number
     "DeviceSerialNumber": re.compile(r'"deviceSerialNo":"([^"]+)"'),  # Extract from "Transaction Started" line
     "RRNumber": re.compile(r'"rrNumber":"([^"]+)"'),
     "TxnType": re.compile(r'"txnType":"([^"]+)"'),
@@ -39,177 +45,225 @@ patterns = {
     "TrxEnd": re.compile(r'Transaction End \((\d+)\)'),
 }
 
-timePattern = re.compile(r"(\d{2}:\d{2}:\d{2}),(\d{3})")
-
-
-# Helper function to calculate TotalTime and TotalTimeW/OSP
-def calculate_times(row):
-    # Convert timestamps to datetime objects
-    def parse_time(time_str):
-        if not time_str:
-            return None
-        return datetime.strptime(time_str, "%H:%M:%S.%f")
-
-    # Extract timestamps from the row
-    trx_start = parse_time(row.get("TrxStart"))
-    request_to_sp = parse_time(row.get("RequestToSP"))
-    response_from_sp = parse_time(row.get("ResponseFromSP"))
-    trx_end = parse_time(row.get("TrxEnd"))
-
-    # Calculate TotalTimeW/OSP
-    if trx_start and request_to_sp and response_from_sp and trx_end:
-        total_time_w_osp = (trx_end - trx_start) - (response_from_sp - request_to_sp)
-    else:
-        total_time_w_osp = None
-
-    # Calculate TotalTime
-    if trx_start and trx_end:
-        total_time = trx_end - trx_start
-    else:
-        total_time = None
-
-    # Format results as strings
-    return (
-        str(total_time) if total_time else "",
-        str(total_time_w_osp) if total_time_w_osp else ""
-    )
-
-# Helper function to process the log file
-srNo = 1  # Initialize the serial number counter
-def process_log_file(file_path):
-    global srNo  # Declare srNo as global to modify its value across function calls
-
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:  # Use 'ignore' to skip errors
-        lines = file.readlines()
-
-    data = []
-    processed_rr_numbers = set()  # Keep track of processed RRNumbers
-    writing_started = False  # Flag to indicate when data should be written
-    row = {}  # A single row to accumulate data between markers
-
-    # Updated time pattern to include milliseconds
-    timePattern = re.compile(r"(\d{2}:\d{2}:\d{2}),(\d{3})")
-
-    for line in lines:
+# What the report takes from the log lines. "TrxStart" and "TrxEnd" carry the
+# terminal number; starts of terminals other than the requested ones are
+# dropped while scanning.
+def new_extractor(terminals):
+    return Extractor("terminal", patterns, allowed={"TrxStart": terminals})
+
+
+# Report rows of one terminal, built event by event from one file exactly as
+# if it was the only terminal being extracted. RRNumbers are deduplicated
+# against `seen`, shared by every file (and run) of a report, which records
+# the RRNumbers of the rows reported.
+class TerminalRows:
+    def __init__(self, terminal_id, file_path, seen):
+        self.terminal_id = terminal_id
+        self.file_path = file_path
+        self.processed_rr_numbers = seen  # Keep track of processed RRNumbers
+        self.writing_started = False  # Flag to indicate when data should be written
+        self.row = {}  # A single row to accumulate data between markers
+
+    # Take the next event; returns the row it completes, or None
+    def feed(self, values, event_ms):
         # Check for "Transaction Started" marker specific to the terminal
-        start_match = re.search(patterns["TrxStart"], line)
-        if start_match:
-            terminal_id = matchingTerminalString
-            writing_started = True  # Start processing data
-            row = {"SrNo": srNo}  # Initialize a new row with the serial number
-            row['FilePath'] = file_path  # Initialize a new row with the file path
-            srNo += 1  # Increment serial number for the next row
-            
-            # Extract timestamp for "Transaction Started" if available
-            time_match = timePattern.search(line)
-            if time_match:
-                hours_minutes_seconds = time_match.group(1)  # "HH:mm:ss"
-                milliseconds = time_match.group(2)  # "563"
-                formatted_time = f"{hours_minutes_seconds}.{milliseconds}"  # Replace ',' with '.'
-                row["TrxStart"] = formatted_time  # Add the formatted timestamp
-            
-            row["DeviceSerialNumber"] = terminal_id  # Add terminal ID to row
-            continue
+        if values.get("TrxStart") == self.terminal_id:
+            stats.count("terminal", "transactions opened")
+            if self.writing_started:
+                stats.count("terminal", "transactions dropped (started again before their end)")
+            self.writing_started = True  # Start processing data
+            self.row = {'FilePath': self.file_path}  # Initialize a new row with the file path
+
+            # Timestamp for "Transaction Started" if available
+            if event_ms is not None:
+                self.row["TrxStart"] = event_ms  # Add the timestamp
+
+            self.row["DeviceSerialNumber"] = self.terminal_id  # Add terminal ID to row
+            return None
 
         # Extract RRNumber
-        rr_number_match = re.search(patterns["RRNumber"], line)
-        if rr_number_match:
-            rr_number = rr_number_match.group(1)
-            if rr_number in processed_rr_numbers:  # Skip duplicate RRNumbers
-                writing_started = False
-                row = {}
-                continue
-            row["RRNumber"] = rr_number  # Add RRNumber to the row
-            processed_rr_numbers.add(rr_number)  # Mark as processed
-            continue
+        if "RRNumber" in values:
+            rr_number = values["RRNumber"]
+            if self.writing_started and f"{self.terminal_id}:{rr_number}" in self.processed_rr_numbers:  # Skip duplicate RRNumbers
+                stats.count("terminal", "transactions dropped (duplicate RRNumber)")
+                self.writing_started = False
+                self.row = {}
+                return None
+            self.row["RRNumber"] = rr_number  # Add RRNumber to the row
+            return None
 
         # Extract TxnType
-        txn_type_match = re.search(patterns["TxnType"], line)
-        if txn_type_match:
-            txn_type = txn_type_match.group(1)
-            row["TxnType"] = txn_type  # Add TxnType to the row
-            continue
+        if "TxnType" in values:
+            self.row["TxnType"] = values["TxnType"]  # Add TxnType to the row
+            return None
 
         # Process data if writing has started
-        if writing_started:
-            for column, pattern in patterns.items():
+        if self.writing_started:
+            for column in values:
                 if column in ["DeviceSerialNumber", "TrxStart", "RRNumber", "TxnType"]:
                     continue  # Skip already processed fields
 
-                match = re.search(pattern, line)
-                if match:
-                    # Extract and store the matched value in the row
-                    if column in row:
-                        continue  # Avoid overwriting existing data
+                # Extract and store the matched value in the row
+                if column in self.row:
+                    continue  # Avoid overwriting existing data
 
-                    time_match = timePattern.search(line)  # Extract time
-                    if time_match:
-                        hours_minutes_seconds = time_match.group(1)  # "HH:mm:ss"
-                        milliseconds = time_match.group(2)  # "563"
-                        formatted_time = f"{hours_minutes_seconds}.{milliseconds}"  # Replace ',' with '.'
-                        row[column] = formatted_time  # Add the formatted time to the row
+                if event_ms is not None:
+                    self.row[column] = event_ms  # Add the time to the row
 
         # Check for "Transaction End" marker specific to the terminal
-        if f"Transaction End ({matchingTerminalString})" in line:
-            writing_started = False  # Stop processing data
+        if values.get("TrxEnd") == self.terminal_id:
+            opened, self.writing_started = self.writing_started, False  # Stop processing data
+            row, self.row = self.row, {}  # Reset the row for the next transaction
 
             # Skip rows without RRNumber or incomplete transactions
             if not row.get("RRNumber"):
-                row = {}  # Reset the row
-                continue
-
-            # Calculate TotalTime and TotalTimeW/OSP for the row
-            total_time, total_time_w_osp = calculate_times(row)
-            row["TotalTime"] = total_time
-            row["TotalTimeW/OSP"] = total_time_w_osp
-
-            # Add the completed row to the data list
-            data.append(row)
-            row = {}  # Reset the row for the next transaction
-
-    return data
-
-
-
-# Function to write data to Excel
-def write_to_excel(data, output_file):
-    # Load the existing workbook or create a new one if it doesn't exist
-    if os.path.exists(output_file):
-        wb = load_workbook(output_file)
-        ws = wb.active
-    else:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Transaction Data"
-    
-    # Write the header row (columns) with bold formatting
-    for col_idx, col in enumerate(columns, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=col)  # Writing the header in row 1
-        cell.font = Font(bold=True)  # Set the font to bold
-    
-    # Write the data starting from row 2 (skip the header row)
-    start_row = 2  # We want to start inserting data from row 2
-    for idx, row in enumerate(data, start=start_row):
-        for col_idx, col in enumerate(columns, start=1):
-            ws.cell(row=idx, column=col_idx, value=row.get(col, ""))
-    
-    # Save the workbook (it won't overwrite the headers)
-    wb.save(output_file)
-    print(f"Data written to {output_file}")
+                if opened:
+                    stats.count("terminal", "transactions dropped (no RRNumber)")
+                return None
+            # Only the RRNumbers of reported rows are recorded, not those of
+            # every RRNumber line (most belong to other terminals)
+            if not self.processed_rr_numbers.add(f"{self.terminal_id}:{row['RRNumber']}"):
+                stats.count("terminal", "transactions dropped (duplicate RRNumber)")
+                return None
+            stats.count("terminal", "transactions completed")
+            return row  # TotalTime & co. are computed by the TransactionStore
+
+        return None
+
+
+# Helper function to build the report rows of every terminal from the scanned
+# events of one file. (terminal, row) pairs are yielded as soon as the row's
+# "Transaction End" event is seen. Pass the same `seen` for every file to
+# drop RRNumbers already reported from an earlier one. Events with different
+# keys (the servers of --sources) each build their own rows. Pass the
+# `states` of an earlier call to go on with the transactions it left open
+# (more of the same file).
+def iter_rows(events, file_path, terminals=(matchingTerminalString,), seen=None, states=None):
+    if seen is None:
+        seen = SeenKeys()
+    if states is None:
+        states = {}  # event key -> TerminalRows of every terminal
+    for key, values, event_ms in events:
+        key_states = states.get(key)
+        if key_states is None:
+            key_states = states[key] = [TerminalRows(terminal_id, file_path, seen) for terminal_id in terminals]
+        for state in key_states:
+            row = state.feed(values, event_ms)
+            if row is not None:
+                yield state.terminal_id, row
+
+
+# Helper function to build all report rows of one file, durations included
+def build_rows(events, file_path, terminals=(matchingTerminalString,)):
+    return list(with_durations((row for _, row in iter_rows(events, file_path, terminals)), columns))
+
+
+# Follow the live log (--follow) and write each row as soon as its
+# "Transaction End" line is written
+def follow_log_folder(args, terminals):
+    sink = open_follow_sink(args, columns)
+    sr_no = 1
+    follow_extractor = new_extractor(terminals)
+    seen = open_seen_keys(args)
+    try:
+        for file_path, lines in follow_files(log_folder, from_start=args.from_start):
+            for _, row in iter_rows(follow_extractor.scan(lines), file_path, terminals, seen):
+                row["SrNo"] = sr_no
+                sr_no += 1
+                for row in with_durations([row], columns):
+                    sink.write(row)
+    except KeyboardInterrupt:
+        pass  # Ctrl+C ends following
+    finally:
+        sink.close()
+        save_seen_keys(args, seen)
+
+
+# Terminal numbers from --terminals and --terminals-file, or matchingTerminalString
+def read_terminals(args):
+    terminals = set()
+    if args.terminals:
+        terminals.update(terminal.strip() for terminal in args.terminals.split(",") if terminal.strip())
+    if args.terminals_file:
+        with open(args.terminals_file, 'r', encoding='utf-8') as file:
+            terminals.update(line.strip() for line in file if line.strip())
+    return sorted(terminals) or [matchingTerminalString]
+
+
+# The reports of one run, one per terminal (a single terminal keeps the plain
+# report name), filled as each file is merged so rows are never all held at once
+class Report:
+    def __init__(self, args, name_suffix=""):
+        self.seen = open_seen_keys(args, name_suffix)  # RRNumbers reported so far, by this run or earlier ones
+        self.terminals = read_terminals(args)
+        self.extractor = new_extractor(self.terminals)
+        self.sinks = {}
+        for terminal_id in self.terminals:
+            terminal_suffix = f"_{terminal_id}" if len(self.terminals) > 1 else ""
+            self.sinks[terminal_id] = open_report(args, columns, output_file, "Transaction Data", bold_header=True, name_suffix=name_suffix + terminal_suffix)
+        self.sr_nos = dict.fromkeys(self.terminals, 1)
+        self.stores = {terminal_id: TransactionStore(columns) for terminal_id in self.terminals}
+        self.open_file = None  # The file read last and its transactions still open
+        self.states = {}
+        self.args = args
+        self.name_suffix = name_suffix
+
+    def add_file(self, file_path, range_events):
+        if file_path != self.open_file:
+            self.open_file, self.states = file_path, {}  # What the previous file left open never ends
+        for terminal_id, row in iter_rows(chain.from_iterable(range_events), file_path, self.terminals, self.seen, self.states):
+            # Numbered in merge order so SrNo doesn't depend on the worker count
+            row["SrNo"] = self.sr_nos[terminal_id]
+            self.sr_nos[terminal_id] += 1
+            # Rows wait column-wise in the store; durations are computed per batch
+            store = self.stores[terminal_id]
+            store.append(row)
+            if store.full():
+                for row in store.drain():
+                    self.sinks[terminal_id].write(row)
+
+    # What --checkpoint keeps for the next run (see run_reports)
+    def suspend(self):
+        return {"sr_nos": self.sr_nos, "seen": self.seen, "open": (self.open_file, self.states)}
+
+    def resume(self, state, continued):
+        self.sr_nos, self.seen = state["sr_nos"], state["seen"]
+        if continued:
+            self.open_file, self.states = state["open"]
+
+    def close(self):
+        for terminal_id, sink in self.sinks.items():
+            for row in self.stores[terminal_id].drain():
+                sink.write(row)
+            sink.close()
+            print(f"Data written to {sink.path}")
+        save_seen_keys(self.args, self.seen, self.name_suffix)
+
+
+# Options of this report on top of the shared ones
+def add_arguments(parser):
+    parser.add_argument(
+        "--terminals", metavar="LIST",
+        help="Comma separated terminal numbers, all extracted in one pass (default matchingTerminalString)",
+    )
+    parser.add_argument(
+        "--terminals-file", metavar="FILE",
+        help="File with one terminal number per line, all extracted in one pass",
+    )
 
 
 # Main code to process logs and create Excel report
 def main():
-    all_data = []
-    for file_name in os.listdir(log_folder):
-        if file_name.endswith(".txt"):
-            file_path = os.path.join(log_folder, file_name)
-            #print(f"Log files: {file_path}")
-            file_data = process_log_file(file_path)
-            all_data.extend(file_data)
+    parser = build_parser("Extract transaction timings for one or more terminals into an Excel report")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.follow:
+        follow_log_folder(args, read_terminals(args))
+        return
 
-    write_to_excel(all_data, output_file)
+    run_reports(args, [Report(args)], log_folder, os.path.basename(__file__))
 
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
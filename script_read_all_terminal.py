@@ -1,7 +1,13 @@
 import os
 from datetime import datetime
 import re
-from openpyxl import load_workbook, Workbook
+from itertools import chain
+from logscan import stats
+from logscan.cli import build_parser, open_follow_sink, open_report, open_seen_keys, save_seen_keys
+from logscan.dedup import SeenKeys
+from logscan.extract import Extractor, run_reports
+from logscan.follow import follow_files
+from logscan.store import with_durations
 
 #Create folder if not exists
 os.makedirs("TerminalExports", exist_ok=True)
@@ -16,12 +22,10 @@ output_file = os.path.join("TerminalExports", f"All_Terminal_Report_{current_tim
 # Column names in the Excel file (must match exactly with your sheet, updated to lowercase)
 columns = [
     "SrNo", "DeviceSerialNumber", "RRNumber", "TrxStart", "CardDecryptionReq", "CardDecryptionRes",
-    "MackingReq", "MackingRes", "RequestToSP", "ResponseFromSP", "TrxEnd", "TotalTime", "TotalTimeW/OSP"
+    "MackingReq", "MackingRes", "RequestToSP", "ResponseFromSP", "TrxEnd", "TotalTime", "TotalTimeW/OSP",
+    "CardDecryptionTime", "MackingTime", "SPTime"
 ]
 
-# Columns to leave blank (empty strings)
-blank_columns = ["RRNumber"]
-
 # Field mapping for regex extraction (field names to match in log files)
 patterns = {
     "TrxStart": re.compile(r'Request Received: Sale'),
@@ -36,162 +40,179 @@ patterns = {
     "TrxEnd": re.compile(r'Transaction End \((\d+)\)'),
 }
 
-timePattern = re.compile(r"(\d{2}:\d{2}:\d{2}),(\d{3})")
+# Marks the end of any transaction
+transactionEndMarker = "Transaction End"
 
-# Helper function to calculate TotalTime and TotalTimeW/OSP
-def calculate_times(row):
-    # Convert timestamps to datetime objects
-    def parse_time(time_str):
-        if not time_str:
-            return None
-        return datetime.strptime(time_str, "%H:%M:%S.%f")
-
-    # Extract timestamps from the row
-    trx_start = parse_time(row.get("TrxStart"))
-    request_to_sp = parse_time(row.get("RequestToSP"))
-    response_from_sp = parse_time(row.get("ResponseFromSP"))
-    trx_end = parse_time(row.get("TrxEnd"))
-
-    # Calculate TotalTimeW/OSP
-    if trx_start and request_to_sp and response_from_sp and trx_end:
-        total_time_w_osp = (trx_end - trx_start) - (response_from_sp - request_to_sp)
-    else:
-        total_time_w_osp = None
-
-    # Calculate TotalTime
-    if trx_start and trx_end:
-        total_time = trx_end - trx_start
-    else:
-        total_time = None
-
-    # Format results as strings
-    return (
-        str(total_time) if total_time else "",
-        str(total_time_w_osp) if total_time_w_osp else ""
-    )
-
-# Helper function to process the log file
-srNo = 1  # Initialize the serial number counter
-def process_log_file(file_path):
-    global srNo  # Declare srNo as global to modify its value across function calls
-
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:  # Use 'ignore' to skip errors
-        lines = file.readlines()
-
-    data = []
-    processed_serial_numbers = set()  # Keep track of processed DeviceSerialNumbers
-    row = {}  # A single row to accumulate data between markers
-    writing_started = False  # Flag to indicate when data should be written
-
-    # Updated time pattern to include milliseconds
-    timePattern = re.compile(r"(\d{2}:\d{2}:\d{2}),(\d{3})")
-
-    for line in lines:
+# What the report takes from the log lines. "TransactionEnd" marks the end of
+# any transaction, whichever logger writes it.
+extractor = Extractor("all_terminal", patterns, markers={"TransactionEnd": transactionEndMarker})
+
+
+# Turn log lines into one event per line that matters: (None, field ->
+# captured value, int epoch-ms time). Lines are bytes for the bytes engine, str
+# otherwise.
+def scan_lines(lines, binary=False):
+    return extractor.scan(lines, binary)
+
+
+# The row being built from one stream of lines (the lines of one server with
+# --sources): data is only taken between a transaction's start and its end
+class TransactionRows:
+    def __init__(self, seen):
+        self.processed_serial_numbers = seen  # Keep track of processed DeviceSerialNumbers
+        self.row = {}  # A single row to accumulate data between markers
+        self.writing_started = False  # Flag to indicate when data should be written
+
+    # Take the event of one line; returns the completed row, or None
+    def feed(self, values, event_ms):
         # Check for "Transaction Started" marker
-        start_match = re.search(patterns["TrxStart"], line)
-        if start_match:
-            writing_started = True  # Start processing data
-            row = {"SrNo": srNo}  # Initialize a new row with the serial number
-            srNo += 1  # Increment serial number for the next row
-            
-            # Extract timestamp for "Transaction Started" if available
-            time_match = timePattern.search(line)
-            if time_match:
-                hours_minutes_seconds = time_match.group(1)  # "HH:mm:ss"
-                milliseconds = time_match.group(2)  # "563"
-                formatted_time = f"{hours_minutes_seconds}.{milliseconds}"  # Replace ',' with '.'
-                row["TrxStart"] = formatted_time  # Add the formatted timestamp
-            
-            continue
-
-        device_number = re.search(patterns["DeviceSerialNumber"], line)
-        if device_number:
-            device_serial_no = device_number.group(1)
-            row["DeviceSerialNumber"] = device_serial_no  # Add DeviceSerialNumber to the row
-            continue
+        if "TrxStart" in values:
+            stats.count("all_terminal", "transactions opened")
+            if self.writing_started:
+                stats.count("all_terminal", "transactions dropped (started again before their end)")
+            self.writing_started = True  # Start processing data
+            self.row = {}  # Initialize a new row
+
+            # Timestamp for "Transaction Started" if available
+            if event_ms is not None:
+                self.row["TrxStart"] = event_ms  # Add the timestamp
+
+            return None
+
+        if "DeviceSerialNumber" in values:
+            self.row["DeviceSerialNumber"] = values["DeviceSerialNumber"]  # Add DeviceSerialNumber to the row
+            return None
 
         # Process data if writing has started
-        if writing_started:
-            for column, pattern in patterns.items():
-                if column in ["DeviceSerialNumber", "TrxStart"]:
+        if self.writing_started:
+            for column, value in values.items():
+                if column in ["DeviceSerialNumber", "TrxStart", "TransactionEnd"]:
                     continue  # Skip already processed fields
 
-                match = re.search(pattern, line)
-                if match:
-                    # Extract and store the matched value in the row
-                    if column in row:
-                        continue  # Avoid overwriting existing data
-
-                    if column in ["RRNumber"]:
-                        row[column] = match.group(1)  # Add the matched value directly
-                    else:
-                        time_match = timePattern.search(line)  # Extract time
-                        if time_match:
-                            hours_minutes_seconds = time_match.group(1)  # "HH:mm:ss"
-                            milliseconds = time_match.group(2)  # "563"
-                            formatted_time = f"{hours_minutes_seconds}.{milliseconds}"  # Replace ',' with '.'
-                            row[column] = formatted_time  # Add the formatted time to the row
+                # Extract and store the matched value in the row
+                if column in self.row:
+                    continue  # Avoid overwriting existing data
+
+                if column in ["RRNumber"]:
+                    self.row[column] = value  # Add the matched value directly
+                elif event_ms is not None:
+                    self.row[column] = event_ms  # Add the time to the row
 
         # Check for "Transaction End" marker
-        if "Transaction End" in line:
-            writing_started = False  # Stop processing data
+        if "TransactionEnd" in values:
+            opened, self.writing_started = self.writing_started, False  # Stop processing data
+            row, self.row = self.row, {}  # Reset the row for the next transaction
 
             # Skip rows without DeviceSerialNumber or duplicate rows
             device_serial_no = row.get("DeviceSerialNumber", "")
-            if not device_serial_no or device_serial_no in processed_serial_numbers:
-                row = {}  # Reset the row
-                continue
-
-            # Calculate TotalTime and TotalTimeW/OSP for the row
-            total_time, total_time_w_osp = calculate_times(row)
-            row["TotalTime"] = total_time
-            row["TotalTimeW/OSP"] = total_time_w_osp
-
-            # Add the completed row to the data list
-            data.append(row)
-            processed_serial_numbers.add(device_serial_no)  # Mark serial number as processed
-            row = {}  # Reset the row for the next transaction
-
-    return data
-
-
-
-# Function to write data to Excel
-def write_to_excel(data, output_file):
-    # Load the existing workbook or create a new one if it doesn't exist
-    if os.path.exists(output_file):
-        wb = load_workbook(output_file)
-        ws = wb.active
-    else:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Transaction Data"
-    
-    # Write the header row (columns)
-    for col_idx, col in enumerate(columns, start=1):
-        ws.cell(row=1, column=col_idx, value=col)  # Writing the header in row 1
-    
-    # Write the data starting from row 2 (skip the header row)
-    start_row = 2  # We want to start inserting data from row 2
-    for idx, row in enumerate(data, start=start_row):
-        for col_idx, col in enumerate(columns, start=1):
-            ws.cell(row=idx, column=col_idx, value=row.get(col, ""))
-    
-    # Save the workbook (it won't overwrite the headers)
-    wb.save(output_file)
-    print(f"Data written to {output_file}")
+            if not device_serial_no or not self.processed_serial_numbers.add(device_serial_no):
+                if opened:
+                    reason = "duplicate DeviceSerialNumber" if device_serial_no else "no DeviceSerialNumber"
+                    stats.count("all_terminal", f"transactions dropped ({reason})")
+                return None
+
+            # Hand out the completed row (TotalTime & co. are computed by with_durations)
+            stats.count("all_terminal", "transactions completed")
+            return row  # Its serial number was marked as processed above
+
+        return None
+
+
+# Helper function to build the report rows from the scanned events of one file.
+# Rows are yielded as soon as their "Transaction End" event is seen. Pass the
+# same `seen` for every file to drop DeviceSerialNumbers already reported from
+# an earlier one. Events with different keys (the servers of --sources) each
+# build their own rows. Pass the `states` of an earlier call to go on with
+# the transactions it left open (more of the same file).
+def iter_rows(events, file_path, seen=None, states=None):
+    if seen is None:
+        seen = SeenKeys()
+    if states is None:
+        states = {}  # event key -> TransactionRows
+    for key, values, event_ms in events:
+        state = states.get(key)
+        if state is None:
+            state = states[key] = TransactionRows(seen)
+        row = state.feed(values, event_ms)
+        if row is not None:
+            yield row
+
+
+# Helper function to build all report rows of one file, durations included
+def build_rows(events, file_path):
+    return list(with_durations(iter_rows(events, file_path), columns))
+
+
+# Follow the live log (--follow) and write each row as soon as its
+# "Transaction End" line is written
+def follow_log_folder(args):
+    sink = open_follow_sink(args, columns)
+    sr_no = 1
+    seen = open_seen_keys(args)
+    try:
+        for file_path, lines in follow_files(log_folder, from_start=args.from_start):
+            for row in iter_rows(scan_lines(lines), file_path, seen):
+                row["SrNo"] = sr_no
+                sr_no += 1
+                for row in with_durations([row], columns):
+                    sink.write(row)
+    except KeyboardInterrupt:
+        pass  # Ctrl+C ends following
+    finally:
+        sink.close()
+        save_seen_keys(args, seen)
+
+
+# The report of one run, filled as each file is merged so rows are never all
+# held at once
+class Report:
+    extractor = extractor
+
+    def __init__(self, args, name_suffix=""):
+        self.seen = open_seen_keys(args, name_suffix)  # DeviceSerialNumbers reported so far, by this run or earlier ones
+        self.sink = open_report(args, columns, output_file, "Transaction Data", name_suffix=name_suffix)
+        self.sr_no = 1
+        self.open_file = None  # The file read last and its transactions still open
+        self.states = {}
+        self.args = args
+        self.name_suffix = name_suffix
+
+    def add_file(self, file_path, range_events):
+        if file_path != self.open_file:
+            self.open_file, self.states = file_path, {}  # What the previous file left open never ends
+        # Rows stream to the sink; with_durations computes their durations a
+        # batch (STORE_BATCH rows, or the rest of the file) at a time
+        for row in with_durations(iter_rows(chain.from_iterable(range_events), file_path, self.seen, self.states), columns):
+            # Numbered in merge order so SrNo doesn't depend on the worker count
+            row["SrNo"] = self.sr_no
+            self.sr_no += 1
+            self.sink.write(row)
+
+    # What --checkpoint keeps for the next run (see run_reports)
+    def suspend(self):
+        return {"sr_no": self.sr_no, "seen": self.seen, "open": (self.open_file, self.states)}
+
+    def resume(self, state, continued):
+        self.sr_no, self.seen = state["sr_no"], state["seen"]
+        if continued:
+            self.open_file, self.states = state["open"]
+
+    def close(self):
+        self.sink.close()
+        print(f"Data written to {self.sink.path}")
+        save_seen_keys(self.args, self.seen, self.name_suffix)
 
 
 # Main code to process logs and create Excel report
 def main():
-    all_data = []
-    for file_name in os.listdir(log_folder):
-        if file_name.endswith(".txt"):
-            file_path = os.path.join(log_folder, file_name)
-            file_data = process_log_file(file_path)
-            all_data.extend(file_data)
-
-    write_to_excel(all_data, output_file)
+    parser = build_parser("Extract transaction timings for all terminals into an Excel report")
+    args = parser.parse_args()
+
+    if args.follow:
+        follow_log_folder(args)
+        return
+
+    run_reports(args, [Report(args)], log_folder, os.path.basename(__file__))
 
 
 if __name__ == "__main__":
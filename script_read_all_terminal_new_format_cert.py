@@ -1,7 +1,15 @@
 import os
 from datetime import datetime
 import re
-from openpyxl import load_workbook, Workbook
+import sys
+import time
+from itertools import chain
+from logscan import stats
+from logscan.cli import build_parser, open_follow_sink, open_report
+from logscan.correlate import MAX_OPEN, OPEN_TIMEOUT_MS, Correlator
+from logscan.extract import Extractor, run_reports
+from logscan.follow import follow_files
+from logscan.store import with_durations
 
 #Create folder if not exists
 os.makedirs("TerminalExports", exist_ok=True)
@@ -16,7 +24,8 @@ output_file = os.path.join("TerminalExports", f"All_Terminal_Report_{current_tim
 # Column names in the Excel file (must match exactly with your sheet, updated to lowercase)
 columns = [
     "SrNo", "TxnType", "SubTxnType", "DeviceSerialNumber", "RRNumber", "TrxStart", "CardDecryptionReq", "CardDecryptionRes",
-    "MackingReq", "MackingRes", "RequestToSP", "ResponseFromSP", "TrxEnd", "TotalTime", "TotalTimeW/OSP"
+    "MackingReq", "MackingRes", "RequestToSP", "ResponseFromSP", "TrxEnd", "TotalTime", "TotalTimeW/OSP",
+    "CardDecryptionTime", "MackingTime", "SPTime"
 ]
 
 # Field mapping for regex extraction (field names to match in log files)
@@ -36,172 +45,209 @@ patterns = {
     "TrxEnd": re.compile(r'Transaction End \((\d+)\)'),
 }
 
-timePattern = re.compile(r"(\d{2}:\d{2}:\d{2}),(\d{3})")
 UUID_PATTERN = re.compile(r'\[([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})\]')
 
-# Helper function to calculate TotalTime and TotalTimeW/OSP
-def calculate_times(row):
-    # Convert timestamps to datetime objects
-    def parse_time(time_str):
-        if not time_str:
-            return None
-        return datetime.strptime(time_str, "%H:%M:%S.%f")
-
-    # Extract timestamps from the row
-    trx_start = parse_time(row.get("TrxStart"))
-    request_to_sp = parse_time(row.get("RequestToSP"))
-    response_from_sp = parse_time(row.get("ResponseFromSP"))
-    trx_end = parse_time(row.get("TrxEnd"))
-
-    # Calculate TotalTimeW/OSP
-    if trx_start and request_to_sp and response_from_sp and trx_end:
-        total_time_w_osp = (trx_end - trx_start) - (response_from_sp - request_to_sp)
-    else:
-        total_time_w_osp = None
-
-    # Calculate TotalTime
-    if trx_start and trx_end:
-        total_time = trx_end - trx_start
-    else:
-        total_time = None
-
-    # Format results as strings
-    return (
-        str(total_time) if total_time else "",
-        str(total_time_w_osp) if total_time_w_osp else ""
-    )
-
+# What the report takes from the log lines: the tracked markers of every
+# line, grouped by the transaction UUID of the line
+extractor = Extractor("cert", patterns, key=UUID_PATTERN)
 
-# Process all log lines belonging to a single transaction UUID
-def process_transaction(lines):
-    row = {}
-    has_trx_start = False
+# Fields of one transaction UUID, updated event by event as its lines are read
+class TransactionState:
+    def __init__(self):
+        self.row = {}
+        self.has_trx_start = False
 
-    for line in lines:
-        # TxnType / SubTxnType — first match wins
-        if "TxnType" not in row:
-            m = re.search(patterns["TxnType"], line)
-            if m:
-                row["TxnType"] = m.group(1)
+    # Take the field -> captured value dict and epoch-ms time of one marker line
+    def update(self, values, event_ms):
+        row = self.row
 
-        if "SubTxnType" not in row:
-            m = re.search(patterns["SubTxnType"], line)
-            if m:
-                row["SubTxnType"] = m.group(1)
-
-        # DeviceSerialNumber — first match wins
-        if "DeviceSerialNumber" not in row:
-            m = re.search(patterns["DeviceSerialNumber"], line)
-            if m:
-                row["DeviceSerialNumber"] = m.group(1)
-
-        # RRNumber — first match wins (covers Request JSON, Response JSON, and post-TrxEnd lines)
-        if "RRNumber" not in row:
-            m = re.search(patterns["RRNumber"], line)
-            if m:
-                row["RRNumber"] = m.group(1)
+        # TxnType / SubTxnType / DeviceSerialNumber / RRNumber — first match wins
+        # (RRNumber covers Request JSON, Response JSON, and post-TrxEnd lines)
+        for col in ["TxnType", "SubTxnType", "DeviceSerialNumber", "RRNumber"]:
+            if col not in row and col in values:
+                row[col] = values[col]
 
         # TrxStart
-        if re.search(patterns["TrxStart"], line):
-            has_trx_start = True
-            t = timePattern.search(line)
-            if t:
-                row["TrxStart"] = f"{t.group(1)}.{t.group(2)}"
+        if "TrxStart" in values:
+            if not self.has_trx_start:
+                stats.count("cert", "transactions opened")
+            self.has_trx_start = True
+            if event_ms is not None:
+                row["TrxStart"] = event_ms
 
         # Time-stamped fields — first match wins
         for col in ["CardDecryptionReq", "CardDecryptionRes", "MackingReq",
                     "MackingRes", "RequestToSP", "ResponseFromSP", "TrxEnd"]:
-            if col not in row:
-                m = re.search(patterns[col], line)
-                if m:
-                    t = timePattern.search(line)
-                    if t:
-                        row[col] = f"{t.group(1)}.{t.group(2)}"
-
-    if not has_trx_start or not row.get("DeviceSerialNumber"):
-        return None
-
-    total_time, total_time_w_osp = calculate_times(row)
-    row["TotalTime"] = total_time
-    row["TotalTimeW/OSP"] = total_time_w_osp
-    return row
-
-
-# Helper function to process the log file
-srNo = 1  # Initialize the serial number counter
-def process_log_file(file_path):
-    global srNo  # Declare srNo as global to modify its value across function calls
-
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        lines = file.readlines()
-
-    # Group lines by transaction UUID to handle multi-threaded interleaving
-    transactions = {}       # uuid -> list of lines (preserves line order)
-    first_timestamps = {}   # uuid -> first seen timestamp (for chronological sort)
-
-    for line in lines:
-        m = UUID_PATTERN.search(line)
-        if not m:
-            continue
-        uuid = m.group(1)
-        if uuid not in transactions:
-            transactions[uuid] = []
-            t = timePattern.search(line)
-            if t:
-                first_timestamps[uuid] = f"{t.group(1)}.{t.group(2)}"
-        transactions[uuid].append(line)
-
-    # Sort UUIDs by first-seen timestamp to preserve chronological order
-    sorted_uuids = sorted(transactions, key=lambda u: first_timestamps.get(u, ""))
-
-    data = []
-    for uuid in sorted_uuids:
-        row = process_transaction(transactions[uuid])
-        if row:
-            row["SrNo"] = srNo
-            srNo += 1
-            data.append(row)
-
-    return data
-
-
-
-# Function to write data to Excel
-def write_to_excel(data, output_file):
-    # Load the existing workbook or create a new one if it doesn't exist
-    if os.path.exists(output_file):
-        wb = load_workbook(output_file)
-        ws = wb.active
-    else:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Transaction Data"
-
-    # Write the header row (columns)
-    for col_idx, col in enumerate(columns, start=1):
-        ws.cell(row=1, column=col_idx, value=col)  # Writing the header in row 1
-
-    # Write the data starting from row 2 (skip the header row)
-    start_row = 2  # We want to start inserting data from row 2
-    for idx, row in enumerate(data, start=start_row):
-        for col_idx, col in enumerate(columns, start=1):
-            ws.cell(row=idx, column=col_idx, value=row.get(col, ""))
-
-    # Save the workbook (it won't overwrite the headers)
-    wb.save(output_file)
-    print(f"Data written to {output_file}")
+            if col not in row and col in values:
+                if event_ms is not None:
+                    row[col] = event_ms
+
+    # The finished row, or None when the transaction never started properly.
+    # TotalTime & co. are computed by with_durations.
+    def finish(self):
+        if not self.has_trx_start:
+            stats.count("cert", "UUIDs without a TrxStart")
+            return None
+        if not self.row.get("DeviceSerialNumber"):
+            stats.count("cert", "transactions dropped (no DeviceSerialNumber)")
+            return None
+        stats.count("cert", "transactions completed")
+        return self.row
+
+
+# How long (ms) a transaction stays open after its "Transaction End" line, for
+# the lines (RRNumber ...) it logs right after it
+END_GRACE_MS = 500
+
+
+# Correlator that builds the rows of one log file from its events
+def new_correlator(timeout_ms=OPEN_TIMEOUT_MS, max_open=MAX_OPEN):
+    return Correlator(TransactionState, END_GRACE_MS, timeout_ms, max_open)
+
+
+# Helper function to build the report rows from the events of one file, in the
+# order of the first tracked line of each transaction (usually its "Request
+# Received"; untracked lines of a UUID logged before it don't count, so the
+# order can differ from sorting UUIDs by their very first line). Transactions
+# are finished END_GRACE_MS after their "Transaction End" line, so only the
+# ones still open are held. finish=False leaves those open in the correlator,
+# for more of the same file.
+def iter_rows(events, correlator=None, finish=True):
+    if correlator is None:
+        correlator = new_correlator()
+    for uuid, values, event_ms in events:
+        # Log time drives the grace period and eviction, so runs are repeatable
+        yield from correlator.feed(uuid, values, event_ms, event_ms, "TrxEnd" in values)
+    if finish:
+        yield from correlator.flush()  # End of the file: finish what is still open
+
+
+# Helper function to build all report rows of one file, durations included
+def build_rows(events, correlator=None):
+    return list(with_durations(iter_rows(events, correlator), columns))
+
+
+# Follow the live log (--follow) and write each row shortly after its
+# "Transaction End" line is written. The grace period and eviction go by the
+# wall clock here, so rows come out even while the log is quiet.
+def follow_log_folder(args):
+    sink = open_follow_sink(args, columns)
+    sr_no = 1
+    correlator = Correlator(TransactionState, END_GRACE_MS, open_timeout_ms(args), args.max_open, ordered=False)
+    try:
+        for file_path, lines in follow_files(log_folder, from_start=args.from_start, idle_ticks=True):
+            for line in lines:
+                now = time.monotonic() * 1000
+                rows = correlator.advance(now)
+                event = extractor.scan_line(line) if line is not None else None  # None only marks a quiet poll
+                if event is not None:
+                    uuid, values, event_ms = event
+                    rows += correlator.feed(uuid, values, event_ms, now, "TrxEnd" in values)
+                for row in with_durations(rows, columns):
+                    row["SrNo"] = sr_no
+                    sr_no += 1
+                    sink.write(row)
+    except KeyboardInterrupt:
+        pass  # Ctrl+C ends following
+    finally:
+        sink.close()
+        report_evictions(correlator.evicted, file=sys.stderr)
+
+
+# --open-timeout in ms
+def open_timeout_ms(args):
+    return int(args.open_timeout * 1000)
+
+
+# Print how many open transactions had to be evicted, if any
+def report_evictions(evicted, file=None):
+    if evicted:
+        print(f"Evicted {evicted} open transactions (no \"Transaction End\" in time, or too many open)", file=file)
+
+
+# The report of one run, filled as each file is merged so rows are never all
+# held at once
+class Report:
+    extractor = extractor
+
+    def __init__(self, args, name_suffix=""):
+        self.sink = open_report(args, columns, output_file, "Transaction Data", name_suffix=name_suffix)
+        self.timeout_ms = open_timeout_ms(args)
+        self.max_open = args.max_open
+        self.sr_no = 1
+        self.evicted = 0
+        # The file read last, and the correlator holding its transactions still
+        # open; they are finished once the next file starts, or at close()
+        self.open_file = None
+        self.correlator = None
+
+    def add_file(self, file_path, range_events):
+        if file_path != self.open_file:
+            self.finish_open()
+            self.open_file, self.correlator = file_path, new_correlator(self.timeout_ms, self.max_open)
+        self.write_rows(iter_rows(chain.from_iterable(range_events), self.correlator, finish=False))
+
+    # Finish the transactions still open in the file read last
+    def finish_open(self):
+        if self.correlator is None:
+            return
+        self.write_rows(self.correlator.flush())
+        self.evicted += self.correlator.evicted
+        stats.count("cert", "transactions evicted", self.correlator.evicted)
+        self.open_file, self.correlator = None, None
+
+    def write_rows(self, rows):
+        # Rows stream to the sink; with_durations computes their durations a
+        # batch (STORE_BATCH rows, or the rest of the file) at a time
+        for row in with_durations(rows, columns):
+            # Numbered in merge order so SrNo doesn't depend on the worker count
+            row["SrNo"] = self.sr_no
+            self.sr_no += 1
+            self.sink.write(row)
+
+    # What --checkpoint keeps for the next run (see run_reports): the open
+    # transactions go with it instead of being finished by close()
+    def suspend(self):
+        state = {"sr_no": self.sr_no, "open": (self.open_file, self.correlator)}
+        self.open_file, self.correlator = None, None
+        return state
+
+    def resume(self, state, continued):
+        self.sr_no = state["sr_no"]
+        self.open_file, self.correlator = state["open"]
+        if not continued:
+            self.finish_open()
+
+    def close(self):
+        self.finish_open()
+        self.sink.close()
+        print(f"Data written to {self.sink.path}")
+        report_evictions(self.evicted)
+
+
+# Options of this report on top of the shared ones
+def add_arguments(parser):
+    parser.add_argument(
+        "--open-timeout", type=float, default=OPEN_TIMEOUT_MS / 1000, metavar="SECONDS",
+        help="Evict a transaction that logs nothing for this many seconds of log time (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-open", type=int, default=MAX_OPEN, metavar="N",
+        help="Evict the least recently active transaction when more than N are open (default %(default)s)",
+    )
 
 
 # Main code to process logs and create Excel report
 def main():
-    all_data = []
-    for file_name in os.listdir(log_folder):
-        if file_name.endswith(".txt"):
-            file_path = os.path.join(log_folder, file_name)
-            file_data = process_log_file(file_path)
-            all_data.extend(file_data)
-
-    write_to_excel(all_data, output_file)
+    parser = build_parser("Extract transaction timings for all terminals (UUID log format) into an Excel report")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.follow:
+        follow_log_folder(args)
+        return
+
+    run_reports(args, [Report(args)], log_folder, os.path.basename(__file__))
 
 
 if __name__ == "__main__":